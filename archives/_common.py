@@ -0,0 +1,60 @@
+"""
+Hàm dùng chung cho heuristic.py và merging.py: tìm cột, đọc input, ghi output.
+"""
+import openpyxl
+import pandas as pd
+
+
+def build_col_map(df: pd.DataFrame):
+    """Tra cứu cột dựng một lần cho mọi lần pick_col: (tập tên gốc, {tên strip+lower: tên gốc})."""
+    return set(df.columns), {str(col).strip().lower(): col for col in df.columns}
+
+
+def pick_col(col_map, candidates):
+    exact, normalized = col_map
+    for c in candidates:
+        if c in exact:
+            return c
+    for c in candidates:
+        key = str(c).strip().lower()
+        if key in normalized:
+            return normalized[key]
+    return None
+
+
+def read_input(path, sheet_name, column_candidates):
+    """
+    Đọc Excel đầu vào, chỉ parse các cột có thể khớp column_candidates (usecols).
+    Ưu tiên engine calamine (python-calamine, Rust) — nhanh hơn openpyxl nhiều; chưa cài thì dùng openpyxl.
+    """
+    wanted = {str(c).strip().lower() for cands in column_candidates.values() for c in cands}
+
+    def usecols(col):
+        return str(col).strip().lower() in wanted
+
+    try:
+        return pd.read_excel(path, sheet_name=sheet_name, usecols=usecols, engine="calamine")
+    except ImportError:
+        return pd.read_excel(path, sheet_name=sheet_name, usecols=usecols, engine="openpyxl")
+
+
+def write_xlsx(path, sheets):
+    """
+    Ghi {sheet_name: DataFrame} ra xlsx bằng openpyxl write-only:
+    append từng dòng (itertuples) thay vì dựng cả cây cell trong RAM như DataFrame.to_excel.
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    for name, df in sheets.items():
+        ws = wb.create_sheet(name)
+        ws.append([str(c) for c in df.columns])
+        df = df.astype(object).where(df.notna(), None)  # NaN -> ô trống như to_excel
+        for row in df.itertuples(index=False, name=None):
+            ws.append(row)
+    wb.save(path)
+
+
+def write_parquet(out_dir, sheets):
+    """Ghi mỗi sheet thành <out_dir>/<sheet_name>.parquet (pyarrow, zstd) — dữ liệu trung gian, đọc lại bằng pd.read_parquet."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for name, df in sheets.items():
+        df.to_parquet(out_dir / f"{name}.parquet", engine="pyarrow", compression="zstd", index=False)
@@ -1,27 +1,31 @@
 import argparse
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from collections import defaultdict
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
 import time
 
 import pandas as pd
 
+from _common import build_col_map, pick_col, read_input, write_parquet, write_xlsx
 
-def pick_col(df: pd.DataFrame, candidates):
-    for c in candidates:
-        if c in df.columns:
-            return c
-    cols = {str(col).strip().lower(): col for col in df.columns}
-    for c in candidates:
-        key = str(c).strip().lower()
-        if key in cols:
-            return cols[key]
-    return None
+
+COLUMN_CANDIDATES = {
+    "room": ["Phòng", "Phong", "Room", "Mã phòng", "Ma phong"],
+    "shift": ["Ca thi", "Ca", "Cathi", "Shift", "Ca_thi"],
+    "subject": ["Mã môn", "Ma mon", "Mon thi", "Môn thi", "Subject", "Ma_mon"],
+    "students": ["Số sinh viên tham gia thi", "So SV", "So thi sinh", "Students", "Thi sinh"],
+    "capacity": ["Sức chứa thi", "Suc chua", "Capacity", "So cho", "Sức chứa"],
+    "campus": ["Cơ sở", "Co so", "Campus", "Facility", "Site"],
+}
 
 
 class Bin:
-    __slots__ = ("host", "capacity", "used", "subjects", "members")
+    __slots__ = ("bid", "host", "capacity", "used", "subjects", "members")
 
-    def __init__(self, host: int, capacity: int, used: int, subject: str):
+    def __init__(self, bid: int, host: int, capacity: int, used: int, subject: int):
+        self.bid = bid
         self.host = host
         self.capacity = int(capacity)
         self.used = int(used)
@@ -33,55 +37,113 @@ class Bin:
         return self.capacity - self.used
 
 
-def _best_fit_bin(item_subj: str, item_size: int, bins):
+class BinIndex:
+    """
+    Các bin đang mở, sắp theo (remaining, bid) để Best-Fit tra cứu O(log n).
+    subj_to_bins: mã môn -> tập bid đã chứa môn đó (lọc xung đột không cần duyệt từng bin).
+    """
+    __slots__ = ("keys", "by_id", "subj_to_bins")
+
+    def __init__(self):
+        self.keys = []
+        self.by_id = {}
+        self.subj_to_bins = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def add(self, b: Bin):
+        insort(self.keys, (b.remaining, b.bid))
+        self.by_id[b.bid] = b
+        for s in b.subjects:
+            self.subj_to_bins[s].add(b.bid)
+
+    def remove(self, b: Bin):
+        del self.keys[bisect_left(self.keys, (b.remaining, b.bid))]
+        del self.by_id[b.bid]
+        for s in b.subjects:
+            self.subj_to_bins[s].discard(b.bid)
+
+    def place(self, b: Bin, item: int, subj: int, size: int):
+        del self.keys[bisect_left(self.keys, (b.remaining, b.bid))]
+        b.used += size
+        b.subjects.add(subj)
+        b.members.append(item)
+        insort(self.keys, (b.remaining, b.bid))
+        self.subj_to_bins[subj].add(b.bid)
+
+    def unplace(self, b: Bin, subj: int, size: int):
+        """Hoàn tác place() gần nhất trên bin b."""
+        del self.keys[bisect_left(self.keys, (b.remaining, b.bid))]
+        b.used -= size
+        b.subjects.discard(subj)
+        b.members.pop()
+        insort(self.keys, (b.remaining, b.bid))
+        self.subj_to_bins[subj].discard(b.bid)
+
+
+def _best_fit_bin(item_subj: int, item_size: int, index: BinIndex):
     """Best-Fit: chọn bin có remaining sau khi đặt là nhỏ nhất nhưng không âm, và không trùng môn."""
-    best = None
-    best_rem_after = None
-    for b in bins:
-        if item_subj in b.subjects:
-            continue
-        rem_after = b.remaining - item_size
-        if rem_after < 0:
-            continue
-        if best is None or rem_after < best_rem_after:
-            best = b
-            best_rem_after = rem_after
-    return best
-
-
-def greedy_pack_with_conflict(rooms, subjects, students, caps):
+    conflicts = index.subj_to_bins.get(item_subj, ())
+    if len(conflicts) >= len(index):
+        return None
+    keys = index.keys
+    # keys sắp tăng theo remaining -> bin hợp lệ đầu tiên từ vị trí remaining >= size là best-fit
+    for k in range(bisect_left(keys, (item_size, -1)), len(keys)):
+        bid = keys[k][1]
+        if bid not in conflicts:
+            return index.by_id[bid]
+    return None
+
+
+def greedy_pack_with_conflict(rooms, subjects, students, caps, subj_codes=None):
     """
     Greedy Heuristic:
     - Best-Fit Decreasing (theo students giảm dần)
     - Mỗi item: nhét vào bin hợp lệ tốt nhất, nếu không có thì mở bin mới tại chính item đó
     - Post-process: thử đóng bớt bin bằng cách chuyển hết members sang bin khác (nếu được)
+    subj_codes: list mã môn số nguyên đã factorize sẵn cho cả bảng (None -> tự factorize nhóm này)
     """
     n = len(rooms)
+    # mã hoá môn thành số nguyên + ép kiểu một lần: vòng lặp nóng chỉ so sánh int
+    if subj_codes is None:
+        subj_codes = pd.factorize(pd.Series(subjects, dtype=object))[0].tolist()
+    sizes = [int(v) for v in students]
+    caps = [int(v) for v in caps]
+
     idxs = list(range(n))
-    idxs.sort(key=lambda i: (students[i], caps[i]), reverse=True)
+    idxs.sort(key=lambda i: (sizes[i], caps[i]), reverse=True)
 
     assign = [-1] * n
     bins = []
+    index = BinIndex()
 
     # (1) initial packing
     for i in idxs:
-        s = subjects[i]
-        size = int(students[i])
-        b = _best_fit_bin(s, size, bins)
+        s = subj_codes[i]
+        size = sizes[i]
+        b = _best_fit_bin(s, size, index)
         if b is None:
-            b = Bin(host=i, capacity=caps[i], used=size, subject=s)
+            b = Bin(bid=len(bins), host=i, capacity=caps[i], used=size, subject=s)
             bins.append(b)
+            index.add(b)
             assign[i] = i
         else:
-            b.used += size
-            b.subjects.add(s)
-            b.members.append(i)
+            index.place(b, i, s, size)
             assign[i] = b.host
 
     host_to_bin = {b.host: b for b in bins}
 
+    # cận dưới số bin: mỗi môn một bin riêng; thêm tổng SV / sức chứa lớn nhất (làm tròn lên)
+    # chỉ khi mọi phòng đều vừa sức chứa của nó (phòng quá tải mở bin vượt cap -> cận đó sai) và max(caps) > 0
+    lower_bound = max(Counter(subj_codes).values()) if n else 0
+    max_cap = max(caps) if n else 0
+    if max_cap > 0 and all(s <= c for s, c in zip(sizes, caps)):
+        lower_bound = max(lower_bound, -(-sum(sizes) // max_cap))
+
     # (2) local improvement: try to close bins (small/easy bins first)
-    improved = True
+    # greedy đã chạm cận dưới -> không bin nào đóng thêm được, bỏ qua luôn
+    improved = len(host_to_bin) > lower_bound
     passes = 0
     while improved and passes < 5:
         passes += 1
@@ -94,34 +156,31 @@ def greedy_pack_with_conflict(rooms, subjects, students, caps):
             if len(host_to_bin) <= 1:
                 break
 
-            other_bins = [ob for ob in host_to_bin.values() if ob.host != b.host]
+            # các bin khác = index bỏ tạm b ra
+            index.remove(b)
             items = list(b.members)
-            items.sort(key=lambda i: students[i], reverse=True)
-
-            # snapshot for rollback
-            snapshot = [(ob.host, ob.used, set(ob.subjects), list(ob.members)) for ob in other_bins]
+            items.sort(key=lambda i: sizes[i], reverse=True)
 
+            # undo log thay cho snapshot toàn bộ bin khác
             move_plan = {}
+            undo = []
             ok = True
             for i in items:
-                s_i = subjects[i]
-                size_i = int(students[i])
-                ob = _best_fit_bin(s_i, size_i, other_bins)
+                s_i = subj_codes[i]
+                size_i = sizes[i]
+                ob = _best_fit_bin(s_i, size_i, index)
                 if ob is None:
                     ok = False
                     break
-                ob.used += size_i
-                ob.subjects.add(s_i)
-                ob.members.append(i)
+                index.place(ob, i, s_i, size_i)
+                undo.append((ob, s_i, size_i))
                 move_plan[i] = ob.host
 
             if not ok:
                 # rollback
-                for (host, used, subjs, mems) in snapshot:
-                    ob = host_to_bin[host]
-                    ob.used = used
-                    ob.subjects = subjs
-                    ob.members = mems
+                for ob, s_i, size_i in reversed(undo):
+                    index.unplace(ob, s_i, size_i)
+                index.add(b)
                 continue
 
             # success: close bin b
@@ -129,7 +188,9 @@ def greedy_pack_with_conflict(rooms, subjects, students, caps):
                 assign[i] = new_host
 
             del host_to_bin[b.host]
-            improved = True
+            # chạm cận dưới thì dừng hẳn, không cần thêm pass sort + quét lại
+            # (lower_bound ở trên chỉ gồm cận sức chứa khi nó hợp lệ, nên input quá tải không dừng sớm)
+            improved = len(host_to_bin) > lower_bound
             break
 
     open_idx = sorted(list(host_to_bin.keys()), key=lambda t: rooms[t])
@@ -204,6 +265,16 @@ def build_outputs(assign, open_idx, shift, campus, rooms, subjects, students, ca
     return groups, merges, merged_rooms
 
 
+def solve_one(task):
+    """Greedy + build_outputs cho một nhóm (shift, campus); hàm top-level để chạy được trong process pool."""
+    shift, campus, rooms, subjects, students, caps, subj_codes = task
+    t0 = time.perf_counter()
+    assign, open_idx, info = greedy_pack_with_conflict(rooms, subjects, students, caps, subj_codes)
+    runtime = time.perf_counter() - t0
+    groups, merges, merged_rooms = build_outputs(assign, open_idx, shift, campus, rooms, subjects, students, caps)
+    return open_idx, info, runtime, groups, merges, merged_rooms
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Greedy Heuristic: gộp phòng cùng ca + cùng cơ sở + khác môn + đủ sức chứa. Xuất 2 file giống merging.py."
@@ -212,18 +283,23 @@ def main():
     parser.add_argument("-o", "--output", default="IPL_merge_result_greedy.xlsx", help="Main output Excel")
     parser.add_argument("--merged-out", default="phong_sau_gop_greedy.xlsx", help="Merged rooms Excel")
     parser.add_argument("-s", "--sheet", default=0, help="Sheet name or index (default 0)")
+    parser.add_argument("--format", choices=["xlsx", "parquet"], default="xlsx",
+                        help="xlsx: file giao cho người dùng; parquet: thư mục <output>/ mỗi sheet một file (default xlsx)")
     parser.add_argument("--verbose", action="store_true", help="In runtime per group")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Số process giải song song các nhóm (mặc định 1: mỗi nhóm greedy chỉ mất vài ms)")
     args = parser.parse_args()
 
     t_all0 = time.perf_counter()
-    df = pd.read_excel(args.input, sheet_name=args.sheet)
+    df = read_input(args.input, args.sheet, COLUMN_CANDIDATES)
+    col_map = build_col_map(df)
 
-    col_room = pick_col(df, ["Phòng", "Phong", "Room", "Mã phòng", "Ma phong"])
-    col_shift = pick_col(df, ["Ca thi", "Ca", "Cathi", "Shift", "Ca_thi"])
-    col_subj = pick_col(df, ["Mã môn", "Ma mon", "Mon thi", "Môn thi", "Subject", "Ma_mon"])
-    col_students = pick_col(df, ["Số sinh viên tham gia thi", "So SV", "So thi sinh", "Students", "Thi sinh"])
-    col_capacity = pick_col(df, ["Sức chứa thi", "Suc chua", "Capacity", "So cho", "Sức chứa"])
-    col_campus = pick_col(df, ["Cơ sở", "Co so", "Campus", "Facility", "Site"])
+    col_room = pick_col(col_map, COLUMN_CANDIDATES["room"])
+    col_shift = pick_col(col_map, COLUMN_CANDIDATES["shift"])
+    col_subj = pick_col(col_map, COLUMN_CANDIDATES["subject"])
+    col_students = pick_col(col_map, COLUMN_CANDIDATES["students"])
+    col_capacity = pick_col(col_map, COLUMN_CANDIDATES["capacity"])
+    col_campus = pick_col(col_map, COLUMN_CANDIDATES["campus"])
 
     missing = [name for name, col in [
         ("Phòng", col_room),
@@ -267,23 +343,36 @@ def main():
     else:
         work["campus"] = "ALL"
 
+    # factorize môn một lần cho cả bảng, các nhóm dùng chung mã số nguyên
+    work["subj_code"] = pd.factorize(work["subject"])[0]
+
     summary_rows = []
     groups_all, merges_all, merged_all = [], [], []
     stats_rows = []
 
-    for (shift, campus), g in work.groupby(["shift", "campus"], sort=True):
-        g = g.reset_index(drop=True)
-        rooms = g["room"].tolist()
-        subjects = g["subject"].tolist()
-        students = g["students"].tolist()
-        caps = g["capacity"].tolist()
-        n = len(g)
-
-        t0 = time.perf_counter()
-        assign, open_idx, info = greedy_pack_with_conflict(rooms, subjects, students, caps)
-        t1 = time.perf_counter()
+    # vị trí từng nhóm tính một lần, mỗi nhóm chỉ là slice của mảng toàn bảng (không tạo DataFrame con)
+    group_positions = work.groupby(["shift", "campus"], sort=True).indices
+    rooms_all = work["room"].to_numpy()
+    subjects_all = work["subject"].to_numpy()
+    students_all = work["students"].to_numpy()
+    caps_all = work["capacity"].to_numpy()
+    subj_codes_all = work["subj_code"].to_numpy()
+
+    tasks = []
+    for shift, campus in sorted(group_positions):
+        idx = group_positions[(shift, campus)]
+        tasks.append((shift, campus, rooms_all[idx].tolist(), subjects_all[idx].tolist(),
+                      students_all[idx].tolist(), caps_all[idx].tolist(), subj_codes_all[idx].tolist()))
+
+    # các nhóm độc lập -> giải song song; spawn để worker không kế thừa state của process cha
+    if args.workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=mp.get_context("spawn")) as ex:
+            results = list(ex.map(solve_one, tasks, chunksize=4))
+    else:
+        results = map(solve_one, tasks)
 
-        groups, merges, merged_rooms = build_outputs(assign, open_idx, shift, campus, rooms, subjects, students, caps)
+    for (shift, campus, rooms, *_), (open_idx, info, runtime, groups, merges, merged_rooms) in zip(tasks, results):
+        n = len(rooms)
 
         groups_all.extend(groups)
         merges_all.extend(merges)
@@ -296,7 +385,7 @@ def main():
             "bins_open": int(info.get("bins_open", len(open_idx))),
             "objective": float(info.get("objective", len(open_idx))),
             "passes": int(info.get("passes", 0)),
-            "runtime_sec": round(t1 - t0, 4),
+            "runtime_sec": round(runtime, 4),
             "status": info.get("status", "Heuristic"),
         })
 
@@ -309,7 +398,7 @@ def main():
         })
 
         if args.verbose:
-            print(f"[GROUP] shift={shift} campus={campus} n={n} after={len(open_idx)} time={t1-t0:.2f}s")
+            print(f"[GROUP] shift={shift} campus={campus} n={n} after={len(open_idx)} time={runtime:.2f}s")
 
     summary_df = pd.DataFrame(summary_rows)
     groups_df = pd.DataFrame(groups_all)
@@ -330,15 +419,20 @@ def main():
     out_main = Path(args.output)
     out_merged = Path(args.merged_out)
 
-    with pd.ExcelWriter(out_main, engine="openpyxl") as w:
-        summary_by_shift.to_excel(w, sheet_name="Summary", index=False)
-        summary_by_group.to_excel(w, sheet_name="Summary_ByCampus", index=False)
-        groups_df.to_excel(w, sheet_name="Groups", index=False)
-        merges_df.to_excel(w, sheet_name="Merges", index=False)
-        stats_df.to_excel(w, sheet_name="HEUR_Stats", index=False)
-
-    with pd.ExcelWriter(out_merged, engine="openpyxl") as w:
-        merged_df.to_excel(w, sheet_name="MergedRooms", index=False)
+    write_tables = write_xlsx
+    if args.format == "parquet":
+        # mỗi output thành một thư mục cùng tên (bỏ đuôi), mỗi sheet một file .parquet
+        out_main, out_merged = out_main.with_suffix(""), out_merged.with_suffix("")
+        write_tables = write_parquet
+
+    write_tables(out_main, {
+        "Summary": summary_by_shift,
+        "Summary_ByCampus": summary_by_group,
+        "Groups": groups_df,
+        "Merges": merges_df,
+        "HEUR_Stats": stats_df,
+    })
+    write_tables(out_merged, {"MergedRooms": merged_df})
 
     t_all1 = time.perf_counter()
     print(f"✅ Done. Main output: {out_main} (total {t_all1 - t_all0:.2f}s)")
@@ -1,24 +1,66 @@
 import argparse
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from collections import defaultdict
 
+import numpy as np
 import pandas as pd
 import pulp
 
+from _common import build_col_map, pick_col, read_input, write_parquet, write_xlsx
+from heuristic import greedy_pack_with_conflict
 
-def pick_col(df: pd.DataFrame, candidates):
-    for c in candidates:
-        if c in df.columns:
-            return c
-    cols = {str(col).strip().lower(): col for col in df.columns}
-    for c in candidates:
-        key = str(c).strip().lower()
-        if key in cols:
-            return cols[key]
-    return None
 
+COLUMN_CANDIDATES = {
+    "room": ["Phòng", "Phong", "Room", "Mã phòng", "Ma phong"],
+    "shift": ["Ca thi", "Ca", "Cathi", "Shift", "Ca_thi"],
+    "subject": ["Mã môn", "Ma mon", "Mon thi", "Môn thi", "Subject", "Ma_mon"],
+    "students": ["Số sinh viên tham gia thi", "So sinh vien tham gia thi", "Số thí sinh", "Students", "Số SV", "So SV"],
+    "capacity": ["Sức chứa thi", "Suc chua thi", "Sức chứa", "Suc chua", "Capacity"],
+    "campus": ["Cơ sở", "Co so", "Campus", "Facility", "Site"],
+}
 
-def solve_group_exact_milp_pulp(rooms, subjects, students, caps):
+
+def _feasible_mask(rooms, subjects, students, caps, subj_codes=None):
+    """
+    Sanity check + ma trận cạnh khả thi (i, j), tính bằng broadcasting thay vì 2 vòng for:
+      mask[i, j] = i == j  or  (subjects[i] != subjects[j] and students[i] <= caps[j] - students[j])
+    subj_codes: mã môn số nguyên đã factorize sẵn cho cả bảng (None -> factorize nhóm này).
+    Trả về (students_arr, caps_arr, subj_codes, mask).
+    """
+    students_arr = np.asarray(students, dtype=np.int64)
+    caps_arr = np.asarray(caps, dtype=np.int64)
+
+    # Hard sanity: each room must fit itself
+    bad = np.flatnonzero(students_arr > caps_arr)
+    if bad.size:
+        i = int(bad[0])
+        raise ValueError(
+            f"Dữ liệu lỗi: phòng {rooms[i]} có students={students[i]} > capacity={caps[i]}"
+        )
+
+    if subj_codes is None:
+        subj_codes = pd.factorize(pd.Series(subjects, dtype=object))[0]
+    subj_codes = np.asarray(subj_codes, dtype=np.int64)
+    empty = caps_arr - students_arr
+    mask = (students_arr[:, None] <= empty[None, :]) & (subj_codes[:, None] != subj_codes[None, :])
+    np.fill_diagonal(mask, True)
+    return students_arr, caps_arr, subj_codes, mask
+
+
+def _symmetry_classes(subj_codes, students_arr, caps_arr):
+    """
+    Các phòng cùng (môn, số SV, sức chứa) hoán đổi được cho nhau trong mô hình.
+    Trả về danh sách mảng chỉ số (tăng dần) của từng lớp có >= 2 phòng.
+    """
+    sig = np.stack([subj_codes, students_arr, caps_arr], axis=1)
+    cls = np.unique(sig, axis=0, return_inverse=True)[1].ravel()
+    order = np.argsort(cls, kind="stable")
+    parts = np.split(order, np.flatnonzero(np.diff(cls[order])) + 1)
+    return [p for p in parts if p.size > 1]
+
+
+def solve_group_exact_milp_pulp(rooms, subjects, students, caps, subj_codes=None):
     """
     Exact MILP solved by CBC (PuLP) = Branch-and-Bound + LP relaxation.
 
@@ -38,40 +80,15 @@ def solve_group_exact_milp_pulp(rooms, subjects, students, caps):
       min sum_j y_j
     """
     n = len(rooms)
-
-    # Hard sanity: each room must fit itself
-    for i in range(n):
-        if students[i] > caps[i]:
-            raise ValueError(
-                f"Dữ liệu lỗi: phòng {rooms[i]} có students={students[i]} > capacity={caps[i]}"
-            )
-
-    # feasible edges (i,j)
-    feasible = []
-    for i in range(n):
-        for j in range(n):
-            if i == j:
-                feasible.append((i, j))
-            else:
-                if subjects[i] == subjects[j]:
-                    continue
-                empty_j = caps[j] - students[j]
-                if students[i] <= empty_j:
-                    feasible.append((i, j))
+    students_arr, caps_arr, subj_codes, feasible_mask = _feasible_mask(rooms, subjects, students, caps, subj_codes)
+    feasible = [tuple(e) for e in np.argwhere(feasible_mask).tolist()]
 
     # quick: every i must have at least one feasible destination (diagonal ensures it)
-    feasible_js = defaultdict(list)
-    for i, j in feasible:
-        feasible_js[i].append(j)
+    feasible_js = {i: np.flatnonzero(feasible_mask[i]).tolist() for i in range(n)}
     for i in range(n):
-        if i not in feasible_js or len(feasible_js[i]) == 0:
+        if len(feasible_js[i]) == 0:
             raise ValueError(f"Phòng {rooms[i]} không có đích hợp lệ nào (kể cả ở lại).")
 
-    # subject index
-    subj_to_items = defaultdict(list)
-    for i, s in enumerate(subjects):
-        subj_to_items[s].append(i)
-
     # model
     prob = pulp.LpProblem("RoomMerging", pulp.LpMinimize)
 
@@ -79,30 +96,28 @@ def solve_group_exact_milp_pulp(rooms, subjects, students, caps):
     x = pulp.LpVariable.dicts("x", feasible, lowBound=0, upBound=1, cat=pulp.LpBinary)
 
     # objective
-    prob += pulp.lpSum(y[j] for j in range(n))
+    prob += pulp.LpAffineExpression([(y[j], 1) for j in range(n)])
 
     # (1) assignment: sum_j x_ij = 1
     for i in range(n):
-        prob += pulp.lpSum(x[(i, j)] for j in feasible_js[i]) == 1
+        prob += pulp.LpAffineExpression([(x[(i, j)], 1) for j in feasible_js[i]]) == 1
 
     # (2) capacity: sum_i students_i x_ij <= cap_j y_j
     # Need list of i that can go to j
-    feasible_is = defaultdict(list)
-    for i, j in feasible:
-        feasible_is[j].append(i)
+    feasible_is = {j: np.flatnonzero(feasible_mask[:, j]) for j in range(n)}
 
     for j in range(n):
-        prob += pulp.lpSum(students[i] * x[(i, j)] for i in feasible_is[j]) <= caps[j] * y[j]
+        terms = [(x[(i, j)], students[i]) for i in feasible_is[j].tolist()]
+        terms.append((y[j], -caps[j]))
+        prob += pulp.LpAffineExpression(terms) <= 0
 
     # (3) distinct subjects per destination room
+    # nguồn vào j gom theo mã môn (sort ổn định giữ thứ tự i trong từng môn)
     for j in range(n):
-        for s, idxs in subj_to_items.items():
-            terms = []
-            for i in idxs:
-                if (i, j) in x:
-                    terms.append(x[(i, j)])
-            if terms:
-                prob += pulp.lpSum(terms) <= 1
+        src = feasible_is[j]
+        src = src[np.argsort(subj_codes[src], kind="stable")]
+        for idxs in np.split(src, np.flatnonzero(np.diff(subj_codes[src])) + 1):
+            prob += pulp.LpAffineExpression([(x[(i, j)], 1) for i in idxs.tolist()]) <= 1
 
     # (4) y_j == x_jj
     for j in range(n):
@@ -110,13 +125,14 @@ def solve_group_exact_milp_pulp(rooms, subjects, students, caps):
 
     # CUTS (HƯỚNG B) — viết đúng
     total_students = sum(students)
-    prob += pulp.lpSum(caps[j] * y[j] for j in range(n)) >= total_students
+    prob += pulp.LpAffineExpression([(y[j], caps[j]) for j in range(n)]) >= total_students
 
-    need = max((len(v) for v in subj_to_items.values()), default=0)
-    prob += pulp.lpSum(y[j] for j in range(n)) >= need
+    need = int(np.bincount(subj_codes).max()) if n else 0
+    prob += pulp.LpAffineExpression([(y[j], 1) for j in range(n)]) >= need
 
     # solve
-    solver = pulp.PULP_CBC_CMD(msg=False)  # msg=True nếu bạn muốn xem log
+    # threads=1: khi chạy trong process pool, mỗi worker giữ một core
+    solver = pulp.PULP_CBC_CMD(msg=False, threads=1)  # msg=True nếu bạn muốn xem log
     status = prob.solve(solver)
 
     if pulp.LpStatus[status] != "Optimal":
@@ -142,6 +158,109 @@ def solve_group_exact_milp_pulp(rooms, subjects, students, caps):
     }
 
 
+def solve_group_exact_milp_highs(rooms, subjects, students, caps, subj_codes=None):
+    """
+    Cùng mô hình với solve_group_exact_milp_pulp nhưng giải in-process bằng HiGHS
+    (scipy.optimize.milp): không ghi file LP, không spawn tiến trình CBC cho mỗi nhóm.
+    Thêm phá đối xứng (5) và cận trên greedy (6): HiGHS nhanh hơn rõ rệt, còn CBC thì chậm đi
+    nên mô hình PuLP giữ nguyên.
+
+    Biến: [y_0..y_{n-1}, x_e cho từng cạnh khả thi e = (i, j)], ma trận ràng buộc dạng sparse.
+    """
+    from scipy.optimize import Bounds, LinearConstraint, milp
+    from scipy.sparse import coo_matrix
+
+    n = len(rooms)
+    students_arr, caps_arr, subj_codes, feasible_mask = _feasible_mask(rooms, subjects, students, caps, subj_codes)
+    src, dst = np.nonzero(feasible_mask)
+    m = len(src)
+    xcol = n + np.arange(m)
+    ones_m = np.ones(m)
+
+    rows, cols, vals, lb, ub = [], [], [], [], []
+
+    def add_block(r, c, v, lo, hi):
+        rows.append(r + len(lb))
+        cols.append(c)
+        vals.append(v)
+        lb.extend(lo)
+        ub.extend(hi)
+
+    # (1) assignment: sum_j x_ij = 1
+    add_block(src, xcol, ones_m, [1] * n, [1] * n)
+
+    # (2) capacity: sum_i students_i x_ij - cap_j y_j <= 0
+    add_block(np.concatenate([dst, np.arange(n)]),
+              np.concatenate([xcol, np.arange(n)]),
+              np.concatenate([students_arr[src], -caps_arr]),
+              [-np.inf] * n, [0] * n)
+
+    # (3) distinct subjects per destination room (chỉ cần các cặp (j, môn) có >= 2 nguồn)
+    pair = dst * (int(subj_codes.max()) + 1) + subj_codes[src]
+    _, pair_row, pair_count = np.unique(pair, return_inverse=True, return_counts=True)
+    keep = pair_count[pair_row] > 1
+    _, keep_row = np.unique(pair_row[keep], return_inverse=True)
+    n_pairs = int(keep_row.max()) + 1 if keep_row.size else 0
+    add_block(keep_row, xcol[keep], ones_m[keep], [-np.inf] * n_pairs, [1] * n_pairs)
+
+    # (4) y_j == x_jj
+    diag = src == dst
+    add_block(np.concatenate([np.arange(n), dst[diag]]),
+              np.concatenate([np.arange(n), xcol[diag]]),
+              np.concatenate([np.ones(n), -ones_m[diag]]),
+              [0] * n, [0] * n)
+
+    # CUTS: sum cap_j y_j >= total students ; sum y_j >= need
+    need = int(np.bincount(subj_codes).max()) if n else 0
+    add_block(np.zeros(n, dtype=np.int64), np.arange(n), caps_arr.astype(float),
+              [int(students_arr.sum())], [np.inf])
+    add_block(np.zeros(n, dtype=np.int64), np.arange(n), np.ones(n), [need], [np.inf])
+
+    # (5) phá đối xứng: trong mỗi lớp phòng giống hệt nhau chỉ mở theo thứ tự chỉ số, y_a - y_b >= 0
+    classes = _symmetry_classes(subj_codes, students_arr, caps_arr)
+    if classes:
+        a = np.concatenate([cls[:-1] for cls in classes])
+        b = np.concatenate([cls[1:] for cls in classes])
+        k = np.arange(len(a))
+        add_block(np.concatenate([k, k]), np.concatenate([a, b]),
+                  np.concatenate([np.ones(len(a)), -np.ones(len(a))]),
+                  [0] * len(a), [np.inf] * len(a))
+
+    # (6) cận trên từ lời giải greedy (heuristic.py): sum y_j <= số phòng greedy mở
+    _, greedy_open, _ = greedy_pack_with_conflict(rooms, subjects, students, caps, subj_codes.tolist())
+    add_block(np.zeros(n, dtype=np.int64), np.arange(n), np.ones(n), [-np.inf], [len(greedy_open)])
+
+    A = coo_matrix(
+        (np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+        shape=(len(lb), n + m),
+    ).tocsr()
+    c = np.concatenate([np.ones(n), np.zeros(m)])
+
+    res = milp(
+        c,
+        constraints=LinearConstraint(A, lb, ub),
+        integrality=np.ones(n + m),
+        bounds=Bounds(0, 1),
+    )
+    if res.status != 0 or res.x is None:
+        raise RuntimeError(f"MILP failed: status={res.message}")
+
+    # extract
+    x_val = res.x[n:] > 0.5
+    assign = [-1] * n
+    for i, j in zip(src[x_val].tolist(), dst[x_val].tolist()):
+        assign[i] = j
+    if -1 in assign:
+        raise RuntimeError("No assignment for some room (unexpected).")
+    open_idx = [j for j in range(n) if res.x[j] > 0.5]
+
+    # số phòng mở đếm từ nghiệm nguyên, không lấy res.fun (float HiGHS kiểu 6.999999999999998)
+    return assign, open_idx, {
+        "objective": float(len(open_idx)),
+        "status": "Optimal",
+    }
+
+
 def build_outputs_for_group(shift, campus, rooms, subjects, students, caps, assign, open_idx):
     open_set = set(open_idx)
     members = {j: [] for j in open_idx}
@@ -208,6 +327,13 @@ def main():
     parser.add_argument("-o", "--output", default="IPL_merge_result.xlsx", help="Main output Excel")
     parser.add_argument("--merged-out", default="phong_sau_gop.xlsx", help="Merged rooms Excel")
     parser.add_argument("-s", "--sheet", default=0, help="Sheet name or index (default 0)")
+    parser.add_argument("--format", choices=["xlsx", "parquet"], default="xlsx",
+                        help="xlsx: file giao cho người dùng; parquet: thư mục <output>/ mỗi sheet một file (default xlsx)")
+    parser.add_argument("--solver", choices=["highs", "cbc"], default="cbc",
+                        help="MILP backend: cbc (PuLP, mặc định) hoặc highs (scipy, in-process, nhanh hơn). "
+                             "highs ra cùng số phòng tối ưu nhưng có thể chọn cách gộp khác cbc")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Số process giải song song các nhóm (mặc định 1: chạy tuần tự, dễ debug; như heuristic.py)")
     parser.add_argument("--debug-dump", action="store_true", help="Dump failing group to xlsx if any error.")
     args = parser.parse_args()
 
@@ -216,14 +342,15 @@ def main():
     except ValueError:
         sheet_name = args.sheet
 
-    df = pd.read_excel(args.input, sheet_name=sheet_name)
+    df = read_input(args.input, sheet_name, COLUMN_CANDIDATES)
+    col_map = build_col_map(df)
 
-    col_room = pick_col(df, ["Phòng", "Phong", "Room", "Mã phòng", "Ma phong"])
-    col_shift = pick_col(df, ["Ca thi", "Ca", "Cathi", "Shift", "Ca_thi"])
-    col_subj = pick_col(df, ["Mã môn", "Ma mon", "Mon thi", "Môn thi", "Subject", "Ma_mon"])
-    col_students = pick_col(df, ["Số sinh viên tham gia thi", "So sinh vien tham gia thi", "Số thí sinh", "Students", "Số SV", "So SV"])
-    col_capacity = pick_col(df, ["Sức chứa thi", "Suc chua thi", "Sức chứa", "Suc chua", "Capacity"])
-    col_campus = pick_col(df, ["Cơ sở", "Co so", "Campus", "Facility", "Site"])
+    col_room = pick_col(col_map, COLUMN_CANDIDATES["room"])
+    col_shift = pick_col(col_map, COLUMN_CANDIDATES["shift"])
+    col_subj = pick_col(col_map, COLUMN_CANDIDATES["subject"])
+    col_students = pick_col(col_map, COLUMN_CANDIDATES["students"])
+    col_capacity = pick_col(col_map, COLUMN_CANDIDATES["capacity"])
+    col_campus = pick_col(col_map, COLUMN_CANDIDATES["campus"])
 
     missing = [name for name, col in [
         ("Phòng", col_room),
@@ -267,51 +394,78 @@ def main():
     else:
         work["campus"] = "ALL"
 
+    # factorize môn một lần cho cả bảng, các nhóm dùng chung mã số nguyên
+    work["subj_code"] = pd.factorize(work["subject"])[0]
+
+    solve_group = solve_group_exact_milp_pulp
+    if args.solver == "highs":
+        try:
+            import scipy.optimize  # noqa: F401
+            solve_group = solve_group_exact_milp_highs
+        except ImportError:
+            print("[WARN] scipy không có sẵn, dùng CBC (PuLP).")
+
     summary_rows = []
     groups_all, merges_all, merged_all = [], [], []
     stats_rows = []
 
+    jobs = []
     for (shift, campus), g in work.groupby(["shift", "campus"], sort=True):
         g = g.reset_index(drop=True)
-        rooms = g["room"].tolist()
-        subjects = g["subject"].tolist()
-        students = g["students"].tolist()
-        caps = g["capacity"].tolist()
+        jobs.append((shift, campus, g, (
+            g["room"].tolist(), g["subject"].tolist(), g["students"].tolist(), g["capacity"].tolist(),
+            g["subj_code"].to_numpy(),
+        )))
 
-        print(f"Solving shift={shift}, campus={campus}, n={len(g)}")
+    # các nhóm độc lập -> gửi hết vào process pool, lấy kết quả theo đúng thứ tự nhóm
+    pool = None
+    if args.workers > 1 and len(jobs) > 1:
+        pool = ProcessPoolExecutor(max_workers=args.workers, mp_context=mp.get_context("spawn"))
+        futures = [pool.submit(solve_group, *group_args) for *_, group_args in jobs]
 
-        try:
-            assign, open_idx, info = solve_group_exact_milp_pulp(rooms, subjects, students, caps)
-        except Exception as e:
-            print(f"❌ FAIL at shift={shift}, campus={campus}: {e}")
-            if args.debug_dump:
-                dump_path = f"FAIL_shift_{shift}_campus_{campus}.xlsx"
-                g.to_excel(dump_path, index=False)
-                print(f"   ↳ dumped failing group to: {dump_path}")
-            raise
-
-        groups, merges, merged_rooms = build_outputs_for_group(
-            shift, campus, rooms, subjects, students, caps, assign, open_idx
-        )
+    try:
+        for k, (shift, campus, g, (rooms, subjects, students, caps, subj_codes)) in enumerate(jobs):
+            print(f"Solving shift={shift}, campus={campus}, n={len(g)}")
+
+            try:
+                if pool is not None:
+                    assign, open_idx, info = futures[k].result()
+                else:
+                    assign, open_idx, info = solve_group(rooms, subjects, students, caps, subj_codes)
+            except Exception as e:
+                print(f"❌ FAIL at shift={shift}, campus={campus}: {e}")
+                if args.debug_dump:
+                    dump_path = f"FAIL_shift_{shift}_campus_{campus}.xlsx"
+                    g.drop(columns="subj_code").to_excel(dump_path, index=False)
+                    print(f"   ↳ dumped failing group to: {dump_path}")
+                raise
+
+            groups, merges, merged_rooms = build_outputs_for_group(
+                shift, campus, rooms, subjects, students, caps, assign, open_idx
+            )
 
-        summary_rows.append({
-            "Ca thi": shift,
-            "Cơ sở": campus,
-            "Số phòng ban đầu": len(rooms),
-            "Số phòng lúc sau (tối ưu)": len(open_idx),
-            "Giảm": len(rooms) - len(open_idx),
-        })
+            summary_rows.append({
+                "Ca thi": shift,
+                "Cơ sở": campus,
+                "Số phòng ban đầu": len(rooms),
+                "Số phòng lúc sau (tối ưu)": len(open_idx),
+                "Giảm": len(rooms) - len(open_idx),
+            })
 
-        stats_rows.append({
-            "Ca thi": shift,
-            "Cơ sở": campus,
-            "objective(min rooms)": float(info["objective"]),
-            "status": info["status"],
-        })
+            stats_rows.append({
+                "Ca thi": shift,
+                "Cơ sở": campus,
+                "objective(min rooms)": float(info["objective"]),
+                "status": info["status"],
+            })
 
-        groups_all.extend(groups)
-        merges_all.extend(merges)
-        merged_all.extend(merged_rooms)
+            groups_all.extend(groups)
+            merges_all.extend(merges)
+            merged_all.extend(merged_rooms)
+    finally:
+        # kể cả khi một nhóm lỗi: huỷ các nhóm chưa chạy thay vì để pool chạy tiếp
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
 
     summary_by_group = pd.DataFrame(summary_rows).sort_values(["Ca thi", "Cơ sở"]).reset_index(drop=True)
     summary_by_shift = (
@@ -329,15 +483,20 @@ def main():
     out_main = Path(args.output)
     out_merged = Path(args.merged_out)
 
-    with pd.ExcelWriter(out_main, engine="openpyxl") as w:
-        summary_by_shift.to_excel(w, sheet_name="Summary", index=False)
-        summary_by_group.to_excel(w, sheet_name="Summary_ByCampus", index=False)
-        groups_df.to_excel(w, sheet_name="Groups", index=False)
-        merges_df.to_excel(w, sheet_name="Merges", index=False)
-        stats_df.to_excel(w, sheet_name="MILP_Stats", index=False)
-
-    with pd.ExcelWriter(out_merged, engine="openpyxl") as w:
-        merged_df.to_excel(w, sheet_name="MergedRooms", index=False)
+    write_tables = write_xlsx
+    if args.format == "parquet":
+        # mỗi output thành một thư mục cùng tên (bỏ đuôi), mỗi sheet một file .parquet
+        out_main, out_merged = out_main.with_suffix(""), out_merged.with_suffix("")
+        write_tables = write_parquet
+
+    write_tables(out_main, {
+        "Summary": summary_by_shift,
+        "Summary_ByCampus": summary_by_group,
+        "Groups": groups_df,
+        "Merges": merges_df,
+        "MILP_Stats": stats_df,
+    })
+    write_tables(out_merged, {"MergedRooms": merged_df})
 
     print(f"✅ Done. Main output: {out_main}")
     print(f"✅ Done. MergedRooms output: {out_merged}")
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 
 # =========================================================
@@ -20,74 +21,101 @@ OUT_KEY = "savings_by_key.csv"
 OUT_DATE = "savings_by_date.csv"
 OUT_TONGKET = "tongket.csv"
 
-# ===== 1) Load data =====
-df = pd.read_csv(INPUT_FILE, sep=",", encoding="utf-8-sig")
+# ===== 1) Load data (pyarrow reader, only the columns used below) =====
+df = pd.read_csv(
+    INPUT_FILE, sep=",", encoding="utf-8-sig", engine="pyarrow",
+    usecols=["KEY_CA", "NGAYTHI", "F_TENPHMOI", "SUC_CHUA", "F_MAMH", "F_SOLUONG"],
+)
 
 # ===== 2) Parse DATE (Excel serial -> date) with fallback dd/mm/yyyy =====
-df["DATE_DT"] = pd.to_datetime(df["NGAYTHI"], unit="D", origin="1899-12-30", errors="coerce")
-mask_na = df["DATE_DT"].isna()
-df.loc[mask_na, "DATE_DT"] = pd.to_datetime(df.loc[mask_na, "NGAYTHI"], dayfirst=True, errors="coerce")
+# the text fallback only sees rows the serial parse missed (where -> NaN elsewhere); merged with fillna
+date_serial = pd.to_datetime(pd.to_numeric(df["NGAYTHI"], errors="coerce"), unit="D", origin="1899-12-30", errors="coerce")
+date_text = pd.to_datetime(df["NGAYTHI"].where(date_serial.isna()), dayfirst=True, errors="coerce")
+df["DATE_DT"] = date_serial.fillna(date_text)
 df["DATE_ONLY"] = df["DATE_DT"].dt.date
 
 # ===== 3) Merge rooms by KEY_CA (course must be distinct) =====
+def pack_rooms(students, capacities, course_codes):
+    """
+    First-Fit over plain int lists (no per-row Series boxing).
+    Returns (bin_items, bin_total); each bin's host room is its first item.
+    """
+    bin_items, bin_cap, bin_total, bin_courses = [], [], [], []
+
+    for i, (size, code) in enumerate(zip(students, course_codes)):
+        for b in range(len(bin_items)):
+            # capacity + only merge different courses
+            if bin_total[b] + size <= bin_cap[b] and code not in bin_courses[b]:
+                bin_items[b].append(i)
+                bin_courses[b].add(code)
+                bin_total[b] += size
+                break
+        else:
+            bin_items.append([i])
+            bin_cap.append(capacities[i])
+            bin_total.append(size)
+            bin_courses.append({code})
+
+    return bin_items, bin_total
+
+
+def sort_desc(values):
+    """Positions ordering `values` descending, same order as DataFrame.sort_values(ascending=False)."""
+    n = len(values)
+    return (n - 1 - np.argsort(values[::-1]))[::-1]
+
+
 merged_rows = []
 summary_rows = []
 
-for key_val, group in df.groupby("KEY_CA", dropna=False):
-    rooms_before = len(group)
+# group boundaries computed once; each group is a slice of whole-frame arrays (no per-group DataFrame)
+key_codes, key_values = pd.factorize(df["KEY_CA"], sort=True, use_na_sentinel=False)
+row_order = np.argsort(key_codes, kind="stable")
+group_starts = np.flatnonzero(np.diff(key_codes[row_order])) + 1
+
+courses_all = df["F_MAMH"].to_numpy()
+course_codes_all = pd.factorize(df["F_MAMH"], use_na_sentinel=False)[0]
+students_all = df["F_SOLUONG"].astype(int).to_numpy()
+capacities_all = df["SUC_CHUA"].astype(int).to_numpy()
+rooms_all = df["F_TENPHMOI"].to_numpy()
+dates_all = df["DATE_ONLY"].to_numpy()
+
+for idx in np.split(row_order, group_starts):
+    key_val = key_values[key_codes[idx[0]]]
+    rooms_before = len(idx)
 
     # pack larger classes first
-    group_sorted = group.sort_values("F_SOLUONG", ascending=False)
+    idx = idx[sort_desc(students_all[idx])]
 
-    # each bin = one target room
-    bins = []
-
-    for _, row in group_sorted.iterrows():
-        placed = False
-        course_id = row["F_MAMH"]
-        students = int(row["F_SOLUONG"])
-        exam_capacity = int(row["SUC_CHUA"])
-
-        for b in bins:
-            ok_capacity = (b["current_students"] + students) <= b["exam_capacity"]
-            ok_distinct = course_id not in b["courses"]  # only merge different courses
-
-            if ok_capacity and ok_distinct:
-                b["items"].append(row)
-                b["courses"].add(course_id)
-                b["current_students"] += students
-                placed = True
-                break
+    courses = courses_all[idx].tolist()
+    students = students_all[idx].tolist()
+    capacities = capacities_all[idx].tolist()
+    rooms = rooms_all[idx].tolist()
+    course_codes = course_codes_all[idx].tolist()
 
-        if not placed:
-            bins.append(
-                {
-                    "target_room": row["F_TENPHMOI"],
-                    "exam_capacity": exam_capacity,
-                    "current_students": students,
-                    "courses": {course_id},
-                    "items": [row],
-                }
-            )
+    # each bin = one target room
+    bin_items, bin_total = pack_rooms(students, capacities, course_codes)
 
     # detailed merge output
-    date_only = group_sorted.iloc[0]["DATE_ONLY"]
-    for b in bins:
+    date_only = dates_all[idx[0]]
+    for items, total in zip(bin_items, bin_total):
+        host = items[0]
+        exam_capacity = capacities[host]
         merged_rows.append(
             {
                 "KEY": key_val,
                 "DATE": date_only,
-                "TARGET ROOM": b["target_room"],
-                "ROOM EXAM CAPACITY": b["exam_capacity"],
-                "TOTAL STUDENTS": b["current_students"],
+                "TARGET ROOM": rooms[host],
+                "ROOM EXAM CAPACITY": exam_capacity,
+                "TOTAL STUDENTS": total,
                 "COURSES MERGED": ", ".join(
-                    [f'{r["F_MAMH"]}({int(r["F_SOLUONG"])})' for r in b["items"]]
+                    [f"{courses[i]}({students[i]})" for i in items]
                 ),
-                "UTILIZATION": (b["current_students"] / b["exam_capacity"]) if b["exam_capacity"] else 0.0,
+                "UTILIZATION": (total / exam_capacity) if exam_capacity else 0.0,
             }
         )
 
-    rooms_after = len(bins)
+    rooms_after = len(bin_items)
     summary_rows.append(
         {
             "DATE": date_only,
@@ -103,7 +131,7 @@ df_key = pd.DataFrame(summary_rows)
 
 # ===== 4) Daily savings =====
 df_day = (
-    df_key.groupby("DATE", as_index=False)[["ROOMS_BEFORE", "ROOMS_AFTER", "ROOMS_SAVED"]]
+    df_key.groupby("DATE", as_index=False, sort=False)[["ROOMS_BEFORE", "ROOMS_AFTER", "ROOMS_SAVED"]]
     .sum()
     .sort_values("DATE")
 )
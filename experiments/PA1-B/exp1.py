@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 
 # =========================================================
@@ -32,47 +33,48 @@ NEW_ROOMS = [
     {"ROOM ID": "B5-GD", "ROOM EXAM CAPACITY": 130, "CAMPUS": "CS1"},
 ]
 DUMMY_PREFIX = "__DUMMY__"
+CAMPUS_MAP = {"1": "CS1", "CS1": "CS1", "2": "CS2", "CS2": "CS2"}
 
 
 def parse_exam_date(df: pd.DataFrame) -> pd.DataFrame:
-    # Excel serial -> date, fallback dd/mm/yyyy
-    df["DATE_DT"] = pd.to_datetime(df["NGAYTHI"], unit="D", origin="1899-12-30", errors="coerce")
-    mask_na = df["DATE_DT"].isna()
-    df.loc[mask_na, "DATE_DT"] = pd.to_datetime(df.loc[mask_na, "NGAYTHI"], dayfirst=True, errors="coerce")
-    df["DATE_ONLY"] = df["DATE_DT"].dt.date
+    # Excel serial -> date (numeric values only), fallback dd/mm/yyyy on the rest
+    date_numeric = pd.to_numeric(df["NGAYTHI"], errors="coerce")
+    date_serial = pd.to_datetime(date_numeric, unit="D", origin="1899-12-30", errors="coerce")
+    date_text = pd.to_datetime(df["NGAYTHI"].where(date_serial.isna()), dayfirst=True, errors="coerce")
+    df["DATE_DT"] = date_serial.fillna(date_text)
+    # keep DATE_ONLY as datetime64 (midnight) instead of a column of Python date objects
+    df["DATE_ONLY"] = df["DATE_DT"].dt.floor("D")
     return df
 
 
-def normalize_campus(val) -> str:
+def normalize_campus(coso: pd.Series) -> pd.Series:
     """
     Input COSO could be: CS1/CS2 or 1/2 (or '1', '2').
-    Return: 'CS1' or 'CS2' or '' if unknown.
+    Return: 'CS1' / 'CS2', other values stripped and upper-cased as-is.
     """
-    s = str(val).strip().upper()
-    if s in {"1", "CS1"}:
-        return "CS1"
-    if s in {"2", "CS2"}:
-        return "CS2"
-    return s
+    s = coso.astype(str).str.strip().str.upper()
+    return s.map(CAMPUS_MAP).fillna(s)
 
 
-def is_dummy_course(course_id) -> bool:
-    return str(course_id).startswith(DUMMY_PREFIX)
+def dummy_mask(course_ids: pd.Series) -> np.ndarray:
+    return course_ids.astype(str).str.startswith(DUMMY_PREFIX).to_numpy()
 
 
 def main():
-    # ===== 1) Load =====
-    df = pd.read_csv(INPUT_FILE, sep=",", encoding="utf-8-sig")
+    # ===== 1) Load (header check first, then only the used columns via the pyarrow reader) =====
+    header = pd.read_csv(INPUT_FILE, sep=",", encoding="utf-8-sig", nrows=0).columns
 
     # minimal column checks
     required = ["KEY_CA", "NGAYTHI", "F_TENPHMOI", "SUC_CHUA", "F_MAMH", "F_SOLUONG"]
-    missing = [c for c in required if c not in df.columns]
+    missing = [c for c in required if c not in header]
     if missing:
         raise ValueError(f"Missing required columns in {INPUT_FILE}: {missing}")
 
-    if "COSO" not in df.columns:
+    if "COSO" not in header:
         raise ValueError("Missing column 'COSO' (campus) in phong_thi.csv. Needed to place dummy rooms correctly.")
 
+    df = pd.read_csv(INPUT_FILE, sep=",", encoding="utf-8-sig", engine="pyarrow", usecols=[*required, "COSO"])
+
     # ===== 2) Parse DATE =====
     df = parse_exam_date(df)
 
@@ -81,142 +83,140 @@ def main():
     df["SUC_CHUA"] = pd.to_numeric(df["SUC_CHUA"], errors="coerce").fillna(0).astype(int)
     df["F_MAMH"] = df["F_MAMH"].astype(str)
     df["F_TENPHMOI"] = df["F_TENPHMOI"].astype(str)
+    df["COSO"] = normalize_campus(df["COSO"])
+    # KEY_CA as categorical so the per-KEY groupbys work on integer codes
+    df["KEY_CA"] = df["KEY_CA"].astype("category")
 
-    # ===== 2.1) Keep original to compute ROOMS_BEFORE (exclude dummy) =====
-    df_original = df.copy()
-
-    rooms_before_by_key = (
-        df_original.dropna(subset=["KEY_CA"])
-        .groupby("KEY_CA")
-        .size()
-        .to_dict()
-    )
+    # ===== 2.1) ROOMS_BEFORE from the frame before dummy rows are added =====
+    rooms_before_by_key = df.groupby("KEY_CA", observed=True, sort=False).size().to_dict()
 
     # ===== 2.2) Add dummy rows per KEY, only matching campus =====
-    key_list = df_original["KEY_CA"].dropna().unique().tolist()
-    dummy_rows = []
-
-    for key_val in key_list:
-        rep = df_original.loc[df_original["KEY_CA"] == key_val].iloc[0]
-        key_campus = normalize_campus(rep.get("COSO", ""))
-
-        for r in NEW_ROOMS:
-            if r["CAMPUS"] != key_campus:
-                continue
-
-            # create a row with same columns
-            row = {c: pd.NA for c in df_original.columns}
-
-            row["KEY_CA"] = key_val
-            row["NGAYTHI"] = rep.get("NGAYTHI", pd.NA)
-            row["DATE_DT"] = rep.get("DATE_DT", pd.NA)
-            row["DATE_ONLY"] = rep.get("DATE_ONLY", pd.NA)
-
-            row["COSO"] = r["CAMPUS"]          # normalized campus
-            row["F_TENPHMOI"] = r["ROOM ID"]
-            row["SUC_CHUA"] = int(r["ROOM EXAM CAPACITY"])  # treat as exam capacity
+    # first row of each KEY (in order of appearance) gives its date and campus
+    reps = df.groupby("KEY_CA", observed=True, sort=False).head(1)
+    # per-KEY (date, campus) for the packing loop, instead of reading row 0 of every group
+    key_meta = dict(zip(reps["KEY_CA"], zip(reps["DATE_ONLY"], reps["COSO"])))
+
+    dummy_frames = []
+    for r in NEW_ROOMS:
+        sub = reps[reps["COSO"] == r["CAMPUS"]]
+        if sub.empty:
+            continue
 
+        # one dummy row per KEY of that campus, built column-wise
+        dummy_frames.append(pd.DataFrame({
+            "KEY_CA": sub["KEY_CA"].array,  # same categories, so concat keeps the column categorical
+            "NGAYTHI": sub["NGAYTHI"].to_numpy(),
+            "DATE_DT": sub["DATE_DT"].to_numpy(),
+            "DATE_ONLY": sub["DATE_ONLY"].to_numpy(),
+            "COSO": r["CAMPUS"],  # normalized campus
+            "F_TENPHMOI": r["ROOM ID"],
+            "SUC_CHUA": int(r["ROOM EXAM CAPACITY"]),  # treat as exam capacity
             # dummy course id (unique per dummy room)
-            row["F_MAMH"] = f"{DUMMY_PREFIX}{r['ROOM ID']}"
-            row["F_SOLUONG"] = 0
-
-            dummy_rows.append(row)
+            "F_MAMH": f"{DUMMY_PREFIX}{r['ROOM ID']}",
+            "F_SOLUONG": 0,
+        }))
 
-    if dummy_rows:
-        df = pd.concat([df_original, pd.DataFrame(dummy_rows)], ignore_index=True)
-    else:
-        df = df_original
+    if dummy_frames:
+        df = pd.concat([df, *dummy_frames], ignore_index=True)
 
     # ===== 3) Merge rooms by KEY (greedy bin packing; dummy first) =====
-    merged_results = []
-    summary_rows = []
-
-    for key_val, group in df.groupby("KEY_CA", dropna=False):
+    # sort the whole frame once: KEY, then dummy rows first (open bins with dummy rooms before others),
+    # then larger classes first; lexsort is stable, so each group keeps its original order on ties
+    df["__IS_DUMMY__"] = dummy_mask(df["F_MAMH"])
+    order = np.lexsort((
+        -df["F_SOLUONG"].to_numpy(),
+        ~df["__IS_DUMMY__"].to_numpy(),
+        df["KEY_CA"].cat.codes.to_numpy(),
+    ))
+    df = df.iloc[order]
+
+    # output columns filled per KEY / per bin; DataFrames built column-wise after the loop
+    merge_cols = {c: [] for c in (
+        "KEY", "DATE_ONLY", "CAMPUS", "TARGET ROOM", "ROOM EXAM CAPACITY", "TOTAL STUDENTS", "COURSES MERGED",
+    )}
+    key_cols = {c: [] for c in ("DATE_ONLY", "KEY", "CAMPUS", "ROOMS_BEFORE", "ROOMS_AFTER", "ROOMS_SAVED")}
+
+    for key_val, group in df.groupby("KEY_CA", dropna=False, observed=True):
         if pd.isna(key_val):
             continue
 
         rooms_before = int(rooms_before_by_key.get(key_val, 0))  # EXCLUDE dummy
 
-        group = group.copy()
-        group["__IS_DUMMY__"] = group["F_MAMH"].apply(is_dummy_course).astype(int)
+        # rows already come in packing order (frame sorted once above)
+        dummy_flags = group["__IS_DUMMY__"].tolist()
 
-        # Dummy rows first -> open bins with dummy rooms before others
-        # Then larger classes first
-        group_sorted = group.sort_values(
-            by=["__IS_DUMMY__", "F_SOLUONG"],
-            ascending=[False, False]
-        ).drop(columns=["__IS_DUMMY__"])
+        # column lists once per group; bins keep row positions instead of row Series
+        courses = group["F_MAMH"].tolist()
+        students_list = group["F_SOLUONG"].tolist()
+        capacities = group["SUC_CHUA"].tolist()
+        room_names = group["F_TENPHMOI"].tolist()
+        # one bit per distinct course of this KEY; a bin's courses are an int bitmask (NaN counts as one course)
+        course_codes = pd.factorize(group["F_MAMH"].astype(str), use_na_sentinel=False)[0].tolist()
 
         bins = []
-        for _, row in group_sorted.iterrows():
+        for i in range(len(courses)):
             placed = False
-            course_id = str(row["F_MAMH"])
-            students = int(row["F_SOLUONG"])
-            room_exam_capacity = int(row["SUC_CHUA"])
-            room_name = str(row["F_TENPHMOI"])
+            course_bit = 1 << course_codes[i]
+            students = students_list[i]  # int column (cleaned at load)
 
             for b in bins:
                 ok_capacity = (b["current_students"] + students) <= b["room_exam_capacity"]
-                ok_distinct = course_id not in b["courses"]  # only merge different courses
+                ok_distinct = not (b["courses"] & course_bit)  # only merge different courses
                 if ok_capacity and ok_distinct:
-                    b["items"].append(row)
-                    b["courses"].add(course_id)
+                    b["items"].append(i)
+                    b["courses"] |= course_bit
                     b["current_students"] += students
                     placed = True
                     break
 
             if not placed:
                 bins.append({
-                    "target_room": room_name,
-                    "room_exam_capacity": room_exam_capacity,
+                    "target_room": room_names[i],
+                    "room_exam_capacity": capacities[i],
                     "current_students": students,
-                    "courses": {course_id},
-                    "items": [row],
+                    "courses": course_bit,
+                    "items": [i],
                 })
 
-        date_only = group_sorted.iloc[0]["DATE_ONLY"]
-        time_val = group_sorted.iloc[0].get("GIO", pd.NA)  # optional if exists
-        campus_val = normalize_campus(group_sorted.iloc[0].get("COSO", ""))
+        date_only, campus_val = key_meta[key_val]
 
         # detailed output (exclude dummy courses from COURSE LIST)
+        n_bins = len(bins)
+        merge_cols["KEY"].extend([key_val] * n_bins)
+        merge_cols["DATE_ONLY"].extend([date_only] * n_bins)
+        merge_cols["CAMPUS"].extend([campus_val] * n_bins)
         for b in bins:
-            course_list = ", ".join(
+            merge_cols["TARGET ROOM"].append(b["target_room"])
+            merge_cols["ROOM EXAM CAPACITY"].append(b["room_exam_capacity"])
+            merge_cols["TOTAL STUDENTS"].append(b["current_students"])
+            merge_cols["COURSES MERGED"].append(", ".join(
                 [
-                    f'{r["F_MAMH"]}({int(r["F_SOLUONG"])})'
-                    for r in b["items"]
-                    if not is_dummy_course(r["F_MAMH"])
+                    f"{courses[i]}({students_list[i]})"
+                    for i in b["items"]
+                    if not dummy_flags[i]
                 ]
-            )
-
-            merged_results.append({
-                "KEY": key_val,
-                "DATE_ONLY": date_only,
-                "CAMPUS": campus_val,
-                "TARGET ROOM": b["target_room"],
-                "ROOM EXAM CAPACITY": b["room_exam_capacity"],
-                "TOTAL STUDENTS": b["current_students"],
-                "COURSES MERGED": course_list,
-                "UTILIZATION": (b["current_students"] / b["room_exam_capacity"]) if b["room_exam_capacity"] else 0.0,
-            })
+            ))
 
         rooms_after = len(bins)  # includes dummy bins if they stayed empty
-        rooms_saved = rooms_before - rooms_after
-
-        summary_rows.append({
-            "DATE_ONLY": date_only,
-            "KEY": key_val,
-            "CAMPUS": campus_val,
-            "ROOMS_BEFORE": rooms_before,
-            "ROOMS_AFTER": rooms_after,
-            "ROOMS_SAVED": rooms_saved
-        })
 
-    df_merge = pd.DataFrame(merged_results)
-    df_key = pd.DataFrame(summary_rows)
+        key_cols["DATE_ONLY"].append(date_only)
+        key_cols["KEY"].append(key_val)
+        key_cols["CAMPUS"].append(campus_val)
+        key_cols["ROOMS_BEFORE"].append(rooms_before)
+        key_cols["ROOMS_AFTER"].append(rooms_after)
+        key_cols["ROOMS_SAVED"].append(rooms_before - rooms_after)
+
+    df_merge = pd.DataFrame(merge_cols)
+    # UTILIZATION in one vectorized pass (0.0 for rooms without capacity)
+    caps = df_merge["ROOM EXAM CAPACITY"].to_numpy()
+    df_merge["UTILIZATION"] = np.divide(
+        df_merge["TOTAL STUDENTS"].to_numpy(), caps, out=np.zeros(len(caps)), where=caps != 0
+    )
+    df_key = pd.DataFrame(key_cols)
 
     # ===== 4) Daily savings =====
     df_day = (
-        df_key.groupby("DATE_ONLY", as_index=False)[["ROOMS_BEFORE", "ROOMS_AFTER", "ROOMS_SAVED"]]
+        df_key.groupby("DATE_ONLY", as_index=False, sort=False)[["ROOMS_BEFORE", "ROOMS_AFTER", "ROOMS_SAVED"]]
         .sum()
         .sort_values("DATE_ONLY")
     )
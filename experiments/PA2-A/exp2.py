@@ -26,24 +26,28 @@ def parse_date_column(df: pd.DataFrame) -> pd.DataFrame:
     Robust DATE parsing:
     1) Try Excel serial numbers (only on numeric values)
     2) Fallback to dd/mm/yyyy strings
+    Each distinct DATE value is parsed once, then spread back to the rows.
     """
-    date_numeric = pd.to_numeric(df["DATE"], errors="coerce")
+    codes, uniques = pd.factorize(df["DATE"], use_na_sentinel=False)
+    uniques = pd.Series(uniques)
+    date_numeric = pd.to_numeric(uniques, errors="coerce")
 
-    df["DATE_DT"] = pd.to_datetime(
+    date_dt = pd.to_datetime(
         date_numeric,
         unit="D",
         origin="1899-12-30",
         errors="coerce"
     )
 
-    mask_na = df["DATE_DT"].isna()
-    df.loc[mask_na, "DATE_DT"] = pd.to_datetime(
-        df.loc[mask_na, "DATE"],
+    mask_na = date_dt.isna()
+    date_dt[mask_na] = pd.to_datetime(
+        uniques[mask_na],
         dayfirst=True,
         errors="coerce"
     )
 
-    df["DATE_ONLY"] = df["DATE_DT"].dt.date
+    df["DATE_DT"] = date_dt.to_numpy()[codes]
+    df["DATE_ONLY"] = date_dt.dt.date.to_numpy()[codes]
     return df
 
 
@@ -80,62 +84,67 @@ def merge_rooms(df: pd.DataFrame):
 
         group_sorted = group.sort_values("STUDENTS", ascending=False)
 
-        bins = []
+        # column lists once per group; bins keep row positions instead of row Series
+        course_ids = group_sorted["COURSE ID"].tolist()
+        students_list = group_sorted["STUDENTS"].tolist()
+        exam_caps = group_sorted["EXAM CAPACITY"].tolist()
+        capacities = group_sorted["CAPACITY"].tolist()
+        room_ids = group_sorted["ROOM ID"].tolist()
+        # one bit per distinct course of this KEY; a bin's courses are an int bitmask
+        course_codes = pd.factorize(group_sorted["COURSE ID"], use_na_sentinel=False)[0].tolist()
 
-        for _, row in group_sorted.iterrows():
+        bin_room, bin_cap, bin_current, bin_courses, bin_items = [], [], [], [], []
+
+        for i in range(len(course_ids)):
             placed = False
-            course_id = row["COURSE ID"]
-            n_sv = int(row["STUDENTS"])
+            course_bit = 1 << course_codes[i]
+            n_sv = students_list[i]
 
-            exam_cap = row["EXAM CAPACITY"]
+            exam_cap = exam_caps[i]
             if pd.isna(exam_cap):
                 if STRICT_EXAMCAP_ONLY:
                     exam_cap = 0
                 else:
-                    exam_cap = row["CAPACITY"]
+                    exam_cap = capacities[i]
 
-            for b in bins:
-                ok_distinct = course_id not in b["courses"]
-                ok_capacity = (b["current"] + n_sv) <= b["exam_capacity"]
+            for b in range(len(bin_items)):
+                ok_distinct = not (bin_courses[b] & course_bit)
+                ok_capacity = (bin_current[b] + n_sv) <= bin_cap[b]
                 if ok_distinct and ok_capacity:
-                    b["items"].append(row)
-                    b["courses"].add(course_id)
-                    b["current"] += n_sv
+                    bin_items[b].append(i)
+                    bin_courses[b] |= course_bit
+                    bin_current[b] += n_sv
                     placed = True
                     break
 
             if not placed:
-                bins.append(
-                    {
-                        "target_room": row["ROOM ID"],
-                        "exam_capacity": exam_cap,
-                        "current": n_sv,
-                        "courses": {course_id},
-                        "items": [row],
-                    }
-                )
+                bin_room.append(room_ids[i])
+                bin_cap.append(exam_cap)
+                bin_current.append(n_sv)
+                bin_courses.append(course_bit)
+                bin_items.append([i])
 
         date_only = group_sorted.iloc[0]["DATE_ONLY"]
         time_val = group_sorted.iloc[0]["TIME"]
         campus_val = group_sorted.iloc[0]["CAMPUS"]
 
-        for b in bins:
+        for b in range(len(bin_items)):
             merged_results.append(
                 {
                     "KEY": key_val,
                     "DATE": date_only,
                     "TIME": time_val,
                     "CAMPUS": campus_val,
-                    "TARGET ROOM": b["target_room"],
-                    "EXAM CAPACITY": b["exam_capacity"],
-                    "TOTAL STUDENTS": b["current"],
+                    "TARGET ROOM": bin_room[b],
+                    "EXAM CAPACITY": bin_cap[b],
+                    "TOTAL STUDENTS": bin_current[b],
                     "COURSES MERGED": ", ".join(
-                        [f'{r["COURSE ID"]}({int(r["STUDENTS"])})' for r in b["items"]]
+                        [f"{course_ids[i]}({students_list[i]})" for i in bin_items[b]]
                     ),
                 }
             )
 
-        rooms_after = len(bins)
+        rooms_after = len(bin_items)
         summary_key.append(
             {
                 "DATE": date_only,
@@ -150,7 +159,7 @@ def merge_rooms(df: pd.DataFrame):
     df_key = pd.DataFrame(summary_key)
 
     df_day = (
-        df_key.groupby("DATE", as_index=False)[["ROOMS_BEFORE", "ROOMS_AFTER", "ROOMS_SAVED"]]
+        df_key.groupby("DATE", as_index=False, sort=False)[["ROOMS_BEFORE", "ROOMS_AFTER", "ROOMS_SAVED"]]
         .sum()
         .sort_values("DATE")
     )
@@ -178,7 +187,7 @@ def build_overall_summary(df_key: pd.DataFrame) -> pd.DataFrame:
 
 
 def main():
-    df = pd.read_csv(INPUT_FILE, encoding="utf-8-sig")
+    df = pd.read_csv(INPUT_FILE, encoding="utf-8-sig", engine="pyarrow")
 
     check_required_columns(df)
 
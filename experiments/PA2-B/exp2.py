@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 
 # =========================================================
@@ -30,15 +31,21 @@ NEW_DUMMY_ROOMS = [
     {"ROOM ID": "B5-GD", "CAMPUS": "CS1", "EXAM CAPACITY": 130},
 ]
 
+CAMPUS_MAP = {"1": "CS1", "CS1": "CS1", "2": "CS2", "CS2": "CS2"}
+
 
 def parse_date_column(df: pd.DataFrame) -> pd.DataFrame:
-    date_numeric = pd.to_numeric(df["DATE"], errors="coerce")
-    df["DATE_DT"] = pd.to_datetime(date_numeric, unit="D", origin="1899-12-30", errors="coerce")
+    # parse mỗi giá trị DATE khác nhau một lần (lịch thi chỉ có vài chục ngày), rồi trải lại theo mã factorize
+    codes, uniques = pd.factorize(df["DATE"], use_na_sentinel=False)
+    uniques = pd.Series(uniques)
+    date_numeric = pd.to_numeric(uniques, errors="coerce")
+    date_dt = pd.to_datetime(date_numeric, unit="D", origin="1899-12-30", errors="coerce")
 
-    mask_na = df["DATE_DT"].isna()
-    df.loc[mask_na, "DATE_DT"] = pd.to_datetime(df.loc[mask_na, "DATE"], dayfirst=True, errors="coerce")
+    mask_na = date_dt.isna()
+    date_dt[mask_na] = pd.to_datetime(uniques[mask_na], dayfirst=True, errors="coerce")
 
-    df["DATE_ONLY"] = df["DATE_DT"].dt.date
+    df["DATE_DT"] = date_dt.to_numpy()[codes]
+    df["DATE_ONLY"] = date_dt.dt.date.to_numpy()[codes]
     return df
 
 
@@ -56,17 +63,14 @@ def check_required_columns(df: pd.DataFrame) -> None:
         raise ValueError(f"Missing required columns: {missing}")
 
 
-def norm_campus(x) -> str:
-    s = str(x).strip().upper()
-    if s == "1":
-        return "CS1"
-    if s == "2":
-        return "CS2"
-    return s
+def normalize_campus(campus: pd.Series) -> pd.Series:
+    # chuẩn hoá cả cột một lần: 1/2 -> CS1/CS2, giá trị khác giữ nguyên (đã strip + upper)
+    s = campus.astype(str).str.strip().str.upper()
+    return s.map(CAMPUS_MAP).fillna(s)
 
 
-def is_dummy_course(course_id) -> bool:
-    return str(course_id).startswith(DUMMY_PREFIX)
+def dummy_mask(course_ids: pd.Series) -> np.ndarray:
+    return course_ids.astype(str).str.startswith(DUMMY_PREFIX).to_numpy()
 
 
 def add_dummy_rows_per_key(df: pd.DataFrame) -> pd.DataFrame:
@@ -75,47 +79,31 @@ def add_dummy_rows_per_key(df: pd.DataFrame) -> pd.DataFrame:
     Dummy có STUDENTS=0, COURSE ID unique theo phòng để không bị chặn ok_distinct.
     """
     df2 = df.copy()
-    df2["CAMPUS_NORM"] = df2["CAMPUS"].apply(norm_campus)
-
-    keys = df2["KEY"].dropna().unique().tolist()
-
-    dummy_rows = []
-    for k in keys:
-        g = df2[df2["KEY"] == k]
-        if g.empty:
-            continue
-
-        campus_k = norm_campus(g.iloc[0]["CAMPUS"])
-        date_k = g.iloc[0]["DATE"]
-        time_k = g.iloc[0]["TIME"]
-
-        # chỉ add dummy room có campus trùng campus của KEY đó
-        for r in NEW_DUMMY_ROOMS:
-            if norm_campus(r["CAMPUS"]) != campus_k:
-                continue
-
-            row = {c: pd.NA for c in df2.columns}
-            row["KEY"] = k
-            row["DATE"] = date_k
-            row["TIME"] = time_k
-            row["CAMPUS"] = campus_k
-
-            row["ROOM ID"] = r["ROOM ID"]
-            row["STUDENTS"] = 0
-
+    df2["CAMPUS_NORM"] = normalize_campus(df2["CAMPUS"])
+
+    # dòng đầu tiên của mỗi KEY (theo thứ tự xuất hiện) ghép với các phòng dummy cùng campus
+    heads = df2.groupby("KEY", sort=False).head(1)[["KEY", "DATE", "TIME", "CAMPUS_NORM"]]
+    rooms = pd.DataFrame(NEW_DUMMY_ROOMS)
+    rooms["CAMPUS_NORM"] = normalize_campus(rooms.pop("CAMPUS"))
+    dummy = heads.merge(rooms, on="CAMPUS_NORM")
+
+    if not dummy.empty:
+        dummy = pd.DataFrame({
+            "KEY": dummy["KEY"],
+            "DATE": dummy["DATE"],
+            "TIME": dummy["TIME"],
+            "CAMPUS": dummy["CAMPUS_NORM"],
+            "CAMPUS_NORM": dummy["CAMPUS_NORM"],
+            "ROOM ID": dummy["ROOM ID"],
+            "STUDENTS": 0,
             # exam cap cho bin dummy
-            row["EXAM CAPACITY"] = r["EXAM CAPACITY"]
-
+            "EXAM CAPACITY": dummy["EXAM CAPACITY"],
             # CAPACITY: nếu có thì cho bằng EXAM CAPACITY để fallback không làm sai
-            row["CAPACITY"] = r["EXAM CAPACITY"]
-
+            "CAPACITY": dummy["EXAM CAPACITY"],
             # COURSE ID dummy unique theo phòng
-            row["COURSE ID"] = f"{DUMMY_PREFIX}{r['ROOM ID']}"
-
-            dummy_rows.append(row)
-
-    if dummy_rows:
-        df2 = pd.concat([df2, pd.DataFrame(dummy_rows)], ignore_index=True)
+            "COURSE ID": DUMMY_PREFIX + dummy["ROOM ID"],
+        })
+        df2 = pd.concat([df2, dummy], ignore_index=True)
 
     return df2
 
@@ -125,14 +113,37 @@ def merge_rooms(df: pd.DataFrame):
     summary_key = []
 
     # rooms_before: KHÔNG tính dummy
-    df_original = df[~df["COURSE ID"].astype(str).str.startswith(DUMMY_PREFIX)].copy()
-    rooms_before_by_key = df_original.groupby("KEY", dropna=False).size().to_dict()
-
-    # Group by KEY on df (đã có dummy)
-    for key_val, group in df.groupby("KEY", dropna=False):
-        rooms_before = int(rooms_before_by_key.get(key_val, 0))
-
-        if STRICT_KEY_CONSISTENCY_CHECK and not group.empty:
+    is_dummy_row = dummy_mask(df["COURSE ID"])
+
+    # sort cả bảng một lần: KEY, rồi dummy trước, rồi lớp đông SV (lexsort ổn định nên mỗi KEY giữ thứ tự gốc khi hoà)
+    # -> mỗi KEY là một đoạn liên tiếp [start, end) trên các list cột bên dưới, không tạo DataFrame con cho từng KEY
+    key_codes, key_values = pd.factorize(df["KEY"], sort=True, use_na_sentinel=False)
+    # đếm trên chính mã KEY đã factorize (không hash lại cột KEY lần nữa)
+    rooms_before_by_code = np.bincount(key_codes[~is_dummy_row], minlength=len(key_values)).tolist()
+    order = np.lexsort((-df["STUDENTS"].to_numpy(), ~is_dummy_row, key_codes))
+    df = df.iloc[order]
+    key_codes = key_codes[order]
+    starts = np.flatnonzero(np.diff(key_codes, prepend=-1))
+    ends = np.append(starts[1:], len(key_codes))
+
+    dummy_all = is_dummy_row[order].tolist()
+    course_ids_all = df["COURSE ID"].tolist()
+    students_all = df["STUDENTS"].tolist()
+    exam_caps_all = df["EXAM CAPACITY"].tolist()
+    capacities_all = df["CAPACITY"].tolist()
+    room_ids_all = df["ROOM ID"].tolist()
+    course_codes_all = pd.factorize(df["COURSE ID"].astype(str), use_na_sentinel=False)[0]
+    dates_all = df["DATE_ONLY"].tolist()
+    times_all = df["TIME"].tolist()
+    campuses_all = df["CAMPUS"].tolist()
+
+    # Duyệt từng KEY (df đã có dummy)
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        key_val = key_values[key_codes[start]]
+        rooms_before = rooms_before_by_code[key_codes[start]]
+
+        if STRICT_KEY_CONSISTENCY_CHECK:
+            group = df.iloc[start:end]
             uniq_date = group["DATE_ONLY"].nunique(dropna=True)
             uniq_time = group["TIME"].nunique(dropna=True)
             uniq_campus = group["CAMPUS"].nunique(dropna=True)
@@ -142,64 +153,60 @@ def merge_rooms(df: pd.DataFrame):
                     f"dates={uniq_date}, times={uniq_time}, campus={uniq_campus}"
                 )
 
-        # ---- ưu tiên dummy làm bin trước ----
-        group = group.copy()
-        group["__IS_DUMMY__"] = group["COURSE ID"].apply(is_dummy_course).astype(int)
+        # ---- list của KEY đã theo thứ tự xếp (dummy trước, rồi lớp đông SV); bin giữ vị trí trong đoạn ----
+        dummy_flags = dummy_all[start:end]
+        course_ids = course_ids_all[start:end]
+        students_list = students_all[start:end]
+        exam_caps = exam_caps_all[start:end]
+        capacities = capacities_all[start:end]
+        room_ids = room_ids_all[start:end]
+        # mỗi môn của KEY một bit (mã đánh lại 0..k-1 trong KEY); tập môn của bin là bitmask kiểu int (NaN tính là một môn)
+        course_codes = np.unique(course_codes_all[start:end], return_inverse=True)[1].tolist()
 
-        # dummy trước, rồi đến lớp đông SV
-        group_sorted = group.sort_values(
-            by=["__IS_DUMMY__", "STUDENTS"],
-            ascending=[False, False],
-        ).drop(columns=["__IS_DUMMY__"])
+        bin_room, bin_cap, bin_current, bin_courses, bin_items = [], [], [], [], []
 
-        bins = []
-
-        for _, row in group_sorted.iterrows():
+        for i in range(len(course_ids)):
             placed = False
-            course_id = str(row["COURSE ID"])
-            n_sv = int(row["STUDENTS"])
+            course_bit = 1 << course_codes[i]
+            n_sv = students_list[i]
 
-            exam_cap = row["EXAM CAPACITY"]
+            exam_cap = exam_caps[i]
             if pd.isna(exam_cap):
                 if STRICT_EXAMCAP_ONLY:
                     exam_cap = 0
                 else:
-                    exam_cap = row["CAPACITY"]
+                    exam_cap = capacities[i]
 
             # Try to fit into existing bins
-            for b in bins:
-                ok_distinct = course_id not in b["courses"]
-                ok_capacity = (b["current"] + n_sv) <= b["exam_capacity"]
+            for b in range(len(bin_items)):
+                ok_distinct = not (bin_courses[b] & course_bit)
+                ok_capacity = (bin_current[b] + n_sv) <= bin_cap[b]
                 if ok_distinct and ok_capacity:
-                    b["items"].append(row)
-                    b["courses"].add(course_id)
-                    b["current"] += n_sv
+                    bin_items[b].append(i)
+                    bin_courses[b] |= course_bit
+                    bin_current[b] += n_sv
                     placed = True
                     break
 
             # Otherwise create a new bin (dummy rows được xét trước nên bin dummy mở trước)
             if not placed:
-                bins.append(
-                    {
-                        "target_room": row["ROOM ID"],
-                        "exam_capacity": int(exam_cap) if not pd.isna(exam_cap) else 0,
-                        "current": n_sv,
-                        "courses": {course_id},
-                        "items": [row],
-                    }
-                )
+                bin_room.append(room_ids[i])
+                bin_cap.append(int(exam_cap) if not pd.isna(exam_cap) else 0)
+                bin_current.append(n_sv)
+                bin_courses.append(course_bit)
+                bin_items.append([i])
 
-        date_only = group_sorted.iloc[0]["DATE_ONLY"] if not group_sorted.empty else pd.NaT
-        time_val = group_sorted.iloc[0]["TIME"] if not group_sorted.empty else pd.NA
-        campus_val = group_sorted.iloc[0]["CAMPUS"] if not group_sorted.empty else pd.NA
+        date_only = dates_all[start]
+        time_val = times_all[start]
+        campus_val = campuses_all[start]
 
-        for b in bins:
+        for b in range(len(bin_items)):
             # lọc dummy khỏi COURSES MERGED để file sạch
             courses_merged = ", ".join(
                 [
-                    f'{r["COURSE ID"]}({int(r["STUDENTS"])})'
-                    for r in b["items"]
-                    if not is_dummy_course(r["COURSE ID"])
+                    f"{course_ids[i]}({students_list[i]})"
+                    for i in bin_items[b]
+                    if not dummy_flags[i]
                 ]
             )
             merged_results.append(
@@ -208,14 +215,14 @@ def merge_rooms(df: pd.DataFrame):
                     "DATE": date_only,
                     "TIME": time_val,
                     "CAMPUS": campus_val,
-                    "TARGET ROOM": b["target_room"],
-                    "EXAM CAPACITY": b["exam_capacity"],
-                    "TOTAL STUDENTS": b["current"],
+                    "TARGET ROOM": bin_room[b],
+                    "EXAM CAPACITY": bin_cap[b],
+                    "TOTAL STUDENTS": bin_current[b],
                     "COURSES MERGED": courses_merged,
                 }
             )
 
-        rooms_after = len(bins)
+        rooms_after = len(bin_items)
         summary_key.append(
             {
                 "DATE": date_only,
@@ -230,7 +237,7 @@ def merge_rooms(df: pd.DataFrame):
     df_key = pd.DataFrame(summary_key)
 
     df_day = (
-        df_key.groupby("DATE", as_index=False)[["ROOMS_BEFORE", "ROOMS_AFTER", "ROOMS_SAVED"]]
+        df_key.groupby("DATE", as_index=False, sort=False)[["ROOMS_BEFORE", "ROOMS_AFTER", "ROOMS_SAVED"]]
         .sum()
         .sort_values("DATE")
     )
@@ -258,7 +265,7 @@ def build_overall_summary(df_key: pd.DataFrame) -> pd.DataFrame:
 
 
 def main():
-    df = pd.read_csv(INPUT_FILE, encoding="utf-8-sig")
+    df = pd.read_csv(INPUT_FILE, encoding="utf-8-sig", engine="pyarrow")
 
     check_required_columns(df)
 
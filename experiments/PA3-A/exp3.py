@@ -1,3 +1,5 @@
+import bisect
+
 import pandas as pd
 from typing import Dict, List, Any, Tuple
 
@@ -29,6 +31,7 @@ OUT_TONGKET = "tongket.csv"
 
 
 def load_students(students_path: str) -> pd.DataFrame:
+    # default C engine: DATE_ONLY stays text and blank CS1/CS2 cells read as NaN (filled with 0 below)
     df = pd.read_csv(students_path, encoding="utf-8-sig")
     for col in ["COURSE ID", "DATE_ONLY", "TIME"]:
         if col not in df.columns:
@@ -46,7 +49,7 @@ def load_students(students_path: str) -> pd.DataFrame:
 
 
 def load_rooms(rooms_path: str) -> pd.DataFrame:
-    df = pd.read_csv(rooms_path, encoding="utf-8-sig")
+    df = pd.read_csv(rooms_path, encoding="utf-8-sig", engine="pyarrow")
     required = ["ROOM ID", "EXAM CAPACITY", "CAMPUS_NORM"]
     for col in required:
         if col not in df.columns:
@@ -76,21 +79,23 @@ def split_allocate_fill_rooms(
       unassigned: leftover demand not fitting due to insufficient total room capacity
     """
 
-    remaining = {d["course_id"]: int(d["students"]) for d in demands}
     meta = {d["course_id"]: d for d in demands}
+    # one slot per distinct course (a repeated course id keeps its last demand)
+    course_ids = list(meta)
+    remaining = [int(meta[cid]["students"]) for cid in course_ids]
 
-    def sorted_courses():
-        return sorted(
-            [cid for cid, rem in remaining.items() if rem > 0],
-            key=lambda cid: remaining[cid],
-            reverse=True,
-        )
+    # (-remaining, position) of courses with demand left, kept sorted: the head is the largest
+    # remaining course, ties in demand order (a stable descending sort)
+    queue = sorted((-n, pos) for pos, n in enumerate(remaining) if n > 0)
 
     rooms_sorted = sorted(rooms, key=lambda r: int(r["exam_cap"]), reverse=True)
 
     allocations: List[Dict[str, Any]] = []
 
     for r in rooms_sorted:
+        if not queue:
+            break  # all demand placed; the rest of the rooms stay empty
+
         room_id = r["room_id"]
         room_exam_cap = int(r["exam_cap"])
         room_remaining_cap = room_exam_cap
@@ -98,18 +103,13 @@ def split_allocate_fill_rooms(
         if room_remaining_cap <= 0:
             continue
 
-        for cid in sorted_courses():
-            if room_remaining_cap <= 0:
-                break
-
-            rem_students = remaining[cid]
-            if rem_students <= 0:
-                continue
+        # every course taken but the last is used up, so only that one goes back into the queue
+        while queue and room_remaining_cap > 0:
+            _, pos = queue.pop(0)
+            cid = course_ids[pos]
 
             # per-(course,room) chunk <= room_exam_cap, and <= remaining room cap
-            chunk = min(rem_students, room_remaining_cap, room_exam_cap)
-            if chunk <= 0:
-                continue
+            chunk = min(remaining[pos], room_remaining_cap, room_exam_cap)
 
             allocations.append(
                 {
@@ -119,15 +119,17 @@ def split_allocate_fill_rooms(
                     "ROOM ID": room_id,
                     "ROOM EXAM CAPACITY": room_exam_cap,
                     "COURSE ID": cid,
-                    "ALLOCATED STUDENTS": int(chunk),
+                    "ALLOCATED STUDENTS": chunk,
                 }
             )
 
-            remaining[cid] -= int(chunk)
-            room_remaining_cap -= int(chunk)
+            remaining[pos] -= chunk
+            room_remaining_cap -= chunk
+            if remaining[pos] > 0:
+                bisect.insort(queue, (-remaining[pos], pos))
 
     unassigned = []
-    for cid, rem in remaining.items():
+    for cid, rem in zip(course_ids, remaining):
         if rem > 0:
             d = meta[cid]
             unassigned.append(
@@ -248,44 +250,46 @@ def main():
     students_df = load_students(STUDENTS_FILE)
     rooms_df = load_rooms(ROOMS_FILE)
 
+    # allocator room lists built once per campus and shared by every slot
     rooms_by_campus = {}
     for campus, g in rooms_df.groupby("CAMPUS_NORM"):
-        rooms_by_campus[campus] = (
-            g.sort_values("EXAM CAPACITY", ascending=False)[["ROOM ID", "EXAM CAPACITY"]]
-            .to_dict("records")
-        )
+        g = g.sort_values("EXAM CAPACITY", ascending=False)
+        rooms_by_campus[campus] = [
+            {"room_id": room_id, "exam_cap": cap}
+            for room_id, cap in zip(g["ROOM ID"].tolist(), g["EXAM CAPACITY"].tolist())
+        ]
 
     all_allocations = []
     all_unassigned = []
 
-    for (date_only, time_val), slot in students_df.groupby(["DATE_ONLY", "TIME"]):
-        for campus in ["CS1", "CS2"]:
-            if campus not in rooms_by_campus:
-                continue
-
-            demands = []
-            for _, row in slot.iterrows():
-                n = int(row[campus])
-                if n <= 0:
-                    continue
-                demands.append(
-                    {
-                        "course_id": row["COURSE ID"],
-                        "students": n,
-                        "date": date_only,
-                        "time": time_val,
-                        "campus": campus,
-                    }
-                )
-
-            if not demands:
-                continue
-
-            rooms = [{"room_id": r["ROOM ID"], "exam_cap": r["EXAM CAPACITY"]} for r in rooms_by_campus[campus]]
-            allocations, unassigned = split_allocate_fill_rooms(demands, rooms)
-
-            all_allocations.extend(allocations)
-            all_unassigned.extend(unassigned)
+    # demand in long form (one row per course x campus with students), grouped once per (slot, campus)
+    demand_long = students_df.melt(
+        id_vars=["COURSE ID", "DATE_ONLY", "TIME"],
+        value_vars=["CS1", "CS2"],
+        var_name="CAMPUS",
+        value_name="STUDENTS",
+    )
+    demand_long = demand_long[demand_long["STUDENTS"] > 0]
+
+    for (date_only, time_val, campus), g in demand_long.groupby(["DATE_ONLY", "TIME", "CAMPUS"]):
+        if campus not in rooms_by_campus:
+            continue
+
+        demands = [
+            {
+                "course_id": cid,
+                "students": n,
+                "date": date_only,
+                "time": time_val,
+                "campus": campus,
+            }
+            for cid, n in zip(g["COURSE ID"].tolist(), g["STUDENTS"].tolist())
+        ]
+
+        allocations, unassigned = split_allocate_fill_rooms(demands, rooms_by_campus[campus])
+
+        all_allocations.extend(allocations)
+        all_unassigned.extend(unassigned)
 
     # ===== Export allocation plan =====
     alloc_out = pd.DataFrame(all_allocations)
@@ -1,3 +1,5 @@
+import bisect
+
 import pandas as pd
 from typing import Dict, List, Any, Tuple
 
@@ -30,16 +32,17 @@ DUMMY_ROOMS = [
 ]
 
 
-def norm_campus(x: Any) -> str:
-    s = str(x).strip().upper()
-    if s == "1":
-        return "CS1"
-    if s == "2":
-        return "CS2"
-    return s
+CAMPUS_MAP = {"1": "CS1", "CS1": "CS1", "2": "CS2", "CS2": "CS2"}
+
+
+def normalize_campus(campus: pd.Series) -> pd.Series:
+    """1/2 -> CS1/CS2 over the whole column; other values stripped and upper-cased as-is."""
+    s = campus.astype(str).str.strip().str.upper()
+    return s.map(CAMPUS_MAP).fillna(s)
 
 
 def load_students(students_path: str) -> pd.DataFrame:
+    # default C engine: DATE_ONLY stays text and blank CS1/CS2 cells read as NaN (filled with 0 below)
     df = pd.read_csv(students_path, encoding="utf-8-sig")
     for col in ["COURSE ID", "DATE_ONLY", "TIME"]:
         if col not in df.columns:
@@ -57,7 +60,7 @@ def load_students(students_path: str) -> pd.DataFrame:
 
 
 def load_rooms(rooms_path: str) -> pd.DataFrame:
-    df = pd.read_csv(rooms_path, encoding="utf-8-sig")
+    df = pd.read_csv(rooms_path, encoding="utf-8-sig", engine="pyarrow")
     required = ["ROOM ID", "EXAM CAPACITY", "CAMPUS_NORM"]
     for col in required:
         if col not in df.columns:
@@ -70,11 +73,11 @@ def load_rooms(rooms_path: str) -> pd.DataFrame:
     if "CAPACITY" in df.columns:
         df["CAPACITY"] = pd.to_numeric(df["CAPACITY"], errors="coerce")
 
-    df["CAMPUS_NORM"] = df["CAMPUS_NORM"].apply(norm_campus)
+    df["CAMPUS_NORM"] = normalize_campus(df["CAMPUS_NORM"])
 
     # ---- Add / overwrite dummy rooms into the inventory (available for all slots) ----
     dummy_df = pd.DataFrame(DUMMY_ROOMS)
-    dummy_df["CAMPUS_NORM"] = dummy_df["CAMPUS_NORM"].apply(norm_campus)
+    dummy_df["CAMPUS_NORM"] = normalize_campus(dummy_df["CAMPUS_NORM"])
     dummy_df["EXAM CAPACITY"] = pd.to_numeric(dummy_df["EXAM CAPACITY"], errors="coerce").fillna(0).astype(int)
 
     # remove same ROOM ID if already exists then append dummy
@@ -98,15 +101,14 @@ def split_allocate_fill_rooms(
       allocations: chunk allocations (course can appear multiple times, split across rooms)
       unassigned: leftover demand not fitting due to insufficient total room capacity
     """
-    remaining = {str(d["course_id"]): int(d["students"]) for d in demands}
     meta = {str(d["course_id"]): d for d in demands}
+    # one slot per distinct course (a repeated course id keeps its last demand)
+    course_ids = list(meta)
+    remaining = [int(meta[cid]["students"]) for cid in course_ids]
 
-    def sorted_courses() -> List[str]:
-        return sorted(
-            [cid for cid, rem in remaining.items() if rem > 0],
-            key=lambda cid: remaining[cid],
-            reverse=True,
-        )
+    # (-remaining, position) of courses with demand left, kept sorted: the head is the largest
+    # remaining course, ties in demand order (a stable descending sort)
+    queue = sorted((-n, pos) for pos, n in enumerate(remaining) if n > 0)
 
     # ---- PRIORITIZE dummy rooms FIRST, then others by exam_cap desc ----
     dummy_set = set(str(x) for x in dummy_room_ids)
@@ -122,6 +124,9 @@ def split_allocate_fill_rooms(
     allocations: List[Dict[str, Any]] = []
 
     for r in rooms_sorted:
+        if not queue:
+            break  # all demand placed; the rest of the rooms stay empty
+
         room_id = str(r["room_id"])
         room_exam_cap = int(r["exam_cap"])
         room_remaining_cap = room_exam_cap
@@ -130,17 +135,12 @@ def split_allocate_fill_rooms(
             continue
 
         # Fill this room by allocating chunks from modules (largest remaining first)
-        for cid in sorted_courses():
-            if room_remaining_cap <= 0:
-                break
-
-            rem_students = remaining[cid]
-            if rem_students <= 0:
-                continue
+        # every course taken but the last is used up, so only that one goes back into the queue
+        while queue and room_remaining_cap > 0:
+            _, pos = queue.pop(0)
+            cid = course_ids[pos]
 
-            chunk = min(rem_students, room_remaining_cap, room_exam_cap)
-            if chunk <= 0:
-                continue
+            chunk = min(remaining[pos], room_remaining_cap, room_exam_cap)
 
             allocations.append(
                 {
@@ -150,15 +150,17 @@ def split_allocate_fill_rooms(
                     "ROOM ID": room_id,
                     "ROOM EXAM CAPACITY": room_exam_cap,
                     "COURSE ID": cid,
-                    "ALLOCATED STUDENTS": int(chunk),
+                    "ALLOCATED STUDENTS": chunk,
                 }
             )
 
-            remaining[cid] -= int(chunk)
-            room_remaining_cap -= int(chunk)
+            remaining[pos] -= chunk
+            room_remaining_cap -= chunk
+            if remaining[pos] > 0:
+                bisect.insort(queue, (-remaining[pos], pos))
 
     unassigned = []
-    for cid, rem in remaining.items():
+    for cid, rem in zip(course_ids, remaining):
         if rem > 0:
             d = meta[cid]
             unassigned.append(
@@ -277,47 +279,52 @@ def main():
     students_df = load_students(STUDENTS_FILE)
     rooms_df = load_rooms(ROOMS_FILE)
 
+    # allocator room lists built once per campus and shared by every slot
     rooms_by_campus = {}
     for campus, g in rooms_df.groupby("CAMPUS_NORM"):
-        rooms_by_campus[campus] = (
-            g.sort_values("EXAM CAPACITY", ascending=False)[["ROOM ID", "EXAM CAPACITY"]]
-            .to_dict("records")
-        )
+        g = g.sort_values("EXAM CAPACITY", ascending=False)
+        rooms_by_campus[campus] = [
+            {"room_id": room_id, "exam_cap": int(cap)}
+            for room_id, cap in zip(g["ROOM ID"].tolist(), g["EXAM CAPACITY"].tolist())
+        ]
+
+    # dummy room ids per campus
+    dummy_rooms = pd.DataFrame(DUMMY_ROOMS)
+    dummy_rooms["CAMPUS_NORM"] = normalize_campus(dummy_rooms["CAMPUS_NORM"])
+    dummy_ids_by_campus = dummy_rooms.groupby("CAMPUS_NORM")["ROOM ID"].agg(list).to_dict()
 
     all_allocations = []
     all_unassigned = []
 
-    for (date_only, time_val), slot in students_df.groupby(["DATE_ONLY", "TIME"]):
-        for campus in ["CS1", "CS2"]:
-            if campus not in rooms_by_campus:
-                continue
-
-            demands = []
-            for _, row in slot.iterrows():
-                n = int(row[campus])
-                if n <= 0:
-                    continue
-                demands.append(
-                    {
-                        "course_id": str(row["COURSE ID"]),
-                        "students": n,
-                        "date": date_only,
-                        "time": time_val,
-                        "campus": campus,
-                    }
-                )
-
-            if not demands:
-                continue
-
-            rooms = [{"room_id": r["ROOM ID"], "exam_cap": int(r["EXAM CAPACITY"])} for r in rooms_by_campus[campus]]
-
-            # dummy room ids for this campus only
-            dummy_ids = [r["ROOM ID"] for r in DUMMY_ROOMS if norm_campus(r["CAMPUS_NORM"]) == campus]
-
-            allocations, unassigned = split_allocate_fill_rooms(demands, rooms, dummy_room_ids=dummy_ids)
-            all_allocations.extend(allocations)
-            all_unassigned.extend(unassigned)
+    # demand in long form (one row per course x campus with students), grouped once per (slot, campus)
+    demand_long = students_df.melt(
+        id_vars=["COURSE ID", "DATE_ONLY", "TIME"],
+        value_vars=["CS1", "CS2"],
+        var_name="CAMPUS",
+        value_name="STUDENTS",
+    )
+    demand_long = demand_long[demand_long["STUDENTS"] > 0]
+
+    for (date_only, time_val, campus), g in demand_long.groupby(["DATE_ONLY", "TIME", "CAMPUS"]):
+        if campus not in rooms_by_campus:
+            continue
+
+        demands = [
+            {
+                "course_id": str(cid),
+                "students": n,
+                "date": date_only,
+                "time": time_val,
+                "campus": campus,
+            }
+            for cid, n in zip(g["COURSE ID"].tolist(), g["STUDENTS"].tolist())
+        ]
+
+        allocations, unassigned = split_allocate_fill_rooms(
+            demands, rooms_by_campus[campus], dummy_room_ids=dummy_ids_by_campus.get(campus, [])
+        )
+        all_allocations.extend(allocations)
+        all_unassigned.extend(unassigned)
 
     # ===== Export allocation plan =====
     alloc_out = pd.DataFrame(all_allocations)
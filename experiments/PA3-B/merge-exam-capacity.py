@@ -14,6 +14,7 @@ OUT_FILE = "merge_suggestions.csv"
 
 
 def main():
+    # default C engine: DATE_ONLY stays text and a blank count cell reads as NaN for the coercion below
     df = pd.read_csv(IN_FILE, encoding="utf-8-sig")
 
     required = [
@@ -32,33 +33,37 @@ def main():
     df["ROOM EXAM CAPACITY"] = df["ROOM EXAM CAPACITY"].astype(int)
 
     # ---- per (slot, room, course): sum chunks ----
+    # (dropna=False so chunks without a COURSE ID still count in the room totals below)
     per_course = (
-        df.groupby(["DATE_ONLY", "TIME", "CAMPUS", "ROOM ID", "COURSE ID"], as_index=False)
-          .agg(ALLOCATED=("ALLOCATED STUDENTS", "sum"))
+        df.groupby(["DATE_ONLY", "TIME", "CAMPUS", "ROOM ID", "COURSE ID"], as_index=False, dropna=False)
+          .agg(
+              ALLOCATED=("ALLOCATED STUDENTS", "sum"),
+              ROOM_EXAM_CAPACITY=("ROOM EXAM CAPACITY", "first"),
+          )
     )
 
-    # ---- per (slot, room): totals ----
+    # ---- per (slot, room): totals, re-aggregated from per_course (one pass over df) ----
     per_room = (
-        df.groupby(["DATE_ONLY", "TIME", "CAMPUS", "ROOM ID"], as_index=False)
+        per_course.groupby(["DATE_ONLY", "TIME", "CAMPUS", "ROOM ID"], as_index=False)
           .agg(
-              ROOM_EXAM_CAPACITY=("ROOM EXAM CAPACITY", "first"),
-              TOTAL_STUDENTS=("ALLOCATED STUDENTS", "sum"),
+              ROOM_EXAM_CAPACITY=("ROOM_EXAM_CAPACITY", "first"),
+              TOTAL_STUDENTS=("ALLOCATED", "sum"),
           )
     )
+    per_course = per_course[per_course["COURSE ID"].notna()]
 
     # ---- build "COURSES MERGED" string ----
     per_course = per_course.sort_values(
         ["DATE_ONLY", "TIME", "CAMPUS", "ROOM ID", "ALLOCATED"],
         ascending=[True, True, True, True, False],
     )
-    per_course["COURSE_ITEM"] = per_course.apply(
-        lambda r: f"{r['COURSE ID']}({int(r['ALLOCATED'])})",
-        axis=1
+    per_course["COURSE_ITEM"] = (
+        per_course["COURSE ID"].astype(str) + "(" + per_course["ALLOCATED"].astype(str) + ")"
     )
 
     courses_join = (
         per_course.groupby(["DATE_ONLY", "TIME", "CAMPUS", "ROOM ID"])["COURSE_ITEM"]
-                 .agg(lambda s: ", ".join(s.tolist()))
+                 .agg(", ".join)
                  .reset_index(name="COURSES MERGED")
     )
 
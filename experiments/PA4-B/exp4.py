@@ -1,3 +1,6 @@
+import heapq
+
+import numpy as np
 import pandas as pd
 from typing import Dict, List, Any, Tuple
 
@@ -21,6 +24,7 @@ CAMPUSES = ["CS1", "CS2"]
 
 
 def load_students(students_path: str) -> pd.DataFrame:
+    # default C engine: DATE_ONLY stays text and blank CS1/CS2 cells read as NaN (filled with 0 below)
     df = pd.read_csv(students_path, encoding="utf-8-sig")
 
     required = ["COURSE ID", "DATE_ONLY", "TIME"]
@@ -39,7 +43,7 @@ def load_students(students_path: str) -> pd.DataFrame:
 
 
 def load_rooms(rooms_path: str) -> pd.DataFrame:
-    df = pd.read_csv(rooms_path, encoding="utf-8-sig")
+    df = pd.read_csv(rooms_path, encoding="utf-8-sig", engine="pyarrow")
 
     required = ["ROOM ID", "CAPACITY", "EXAM CAPACITY", "CAMPUS_NORM"]
     for col in required:
@@ -80,14 +84,8 @@ def add_extra_rooms_always_available(rooms_df: pd.DataFrame) -> pd.DataFrame:
         ]
     )
 
-    # Normalize
-    rooms_df = rooms_df.copy()
-    rooms_df["ROOM ID"] = rooms_df["ROOM ID"].astype(str).str.strip()
-    rooms_df["CAMPUS_NORM"] = rooms_df["CAMPUS_NORM"].astype(str).str.strip()
-
-    existing = set(rooms_df["ROOM ID"].tolist())
-
-    to_add = extra[~extra["ROOM ID"].isin(existing)].copy()
+    # ROOM ID / CAMPUS_NORM are already stripped by load_rooms; rooms_df is not modified (concat returns a new frame)
+    to_add = extra[~extra["ROOM ID"].isin(rooms_df["ROOM ID"])]
     if not to_add.empty:
         rooms_df = pd.concat([rooms_df, to_add], ignore_index=True)
 
@@ -101,18 +99,19 @@ def split_allocate_fill_rooms(
     remaining: Dict[str, int] = {d["course_id"]: int(d["students"]) for d in demands}
     meta: Dict[str, Dict[str, Any]] = {d["course_id"]: d for d in demands}
 
-    def sorted_courses() -> List[str]:
-        return sorted(
-            [cid for cid, rem in remaining.items() if rem > 0],
-            key=lambda cid: remaining[cid],
-            reverse=True,
-        )
+    # max-heap of (-remaining, demand order, course) for courses with demand left; ties pop in demand order,
+    # the same order a stable sort by remaining desc gives
+    heap = [(-rem, pos, cid) for pos, (cid, rem) in enumerate(remaining.items()) if rem > 0]
+    heapq.heapify(heap)
 
     rooms_sorted = sorted(rooms, key=lambda r: int(r["cap"]), reverse=True)
 
     allocations: List[Dict[str, Any]] = []
 
     for r in rooms_sorted:
+        if not heap:
+            break  # all demand placed; the rest of the rooms stay empty
+
         room_id = r["room_id"]
         room_cap = int(r["cap"])
         room_exam_cap = int(r["exam_cap"])
@@ -121,14 +120,15 @@ def split_allocate_fill_rooms(
         if room_remaining_cap <= 0:
             continue
 
-        for cid in sorted_courses():
-            if room_remaining_cap <= 0:
-                break
+        # each course at most once per room, largest remaining first; courses left with demand go back
+        # on the heap after the room is done
+        taken = []
+        while heap and room_remaining_cap > 0:
+            entry = heapq.heappop(heap)
+            taken.append(entry)
+            cid = entry[2]
 
             rem_students = remaining[cid]
-            if rem_students <= 0:
-                continue
-
             chunk = min(rem_students, room_remaining_cap, room_exam_cap)
             if chunk <= 0:
                 continue
@@ -149,6 +149,10 @@ def split_allocate_fill_rooms(
             remaining[cid] -= int(chunk)
             room_remaining_cap -= int(chunk)
 
+        for _, pos, cid in taken:
+            if remaining[cid] > 0:
+                heapq.heappush(heap, (-remaining[cid], pos, cid))
+
     unassigned: List[Dict[str, Any]] = []
     for cid, rem in remaining.items():
         if rem > 0:
@@ -172,19 +176,27 @@ def build_overall_summary(
     alloc_out: pd.DataFrame,
     unassigned_out: pd.DataFrame,
     rooms_df: pd.DataFrame,
+    room_sum: pd.DataFrame,
     rooms_used_pivot: pd.DataFrame,
 ) -> pd.DataFrame:
     demand_cs1 = int(students_df["CS1"].sum())
     demand_cs2 = int(students_df["CS2"].sum())
     demand_total = demand_cs1 + demand_cs2
 
-    allocated_total = int(alloc_out["ALLOCATED STUDENTS"].sum()) if not alloc_out.empty else 0
-    allocated_cs1 = int(alloc_out.loc[alloc_out["CAMPUS"] == "CS1", "ALLOCATED STUDENTS"].sum()) if not alloc_out.empty else 0
-    allocated_cs2 = int(alloc_out.loc[alloc_out["CAMPUS"] == "CS2", "ALLOCATED STUDENTS"].sum()) if not alloc_out.empty else 0
+    # per-campus sums in one groupby; every row's CAMPUS is one of CAMPUSES, so their sum is the total
+    alloc_by_campus = (
+        alloc_out.groupby("CAMPUS")["ALLOCATED STUDENTS"].sum() if not alloc_out.empty else pd.Series(dtype=int)
+    )
+    allocated_cs1 = int(alloc_by_campus.get("CS1", 0))
+    allocated_cs2 = int(alloc_by_campus.get("CS2", 0))
+    allocated_total = int(alloc_by_campus.sum())
 
-    unassigned_total = int(unassigned_out["UNASSIGNED STUDENTS"].sum()) if not unassigned_out.empty else 0
-    unassigned_cs1 = int(unassigned_out.loc[unassigned_out["CAMPUS"] == "CS1", "UNASSIGNED STUDENTS"].sum()) if not unassigned_out.empty else 0
-    unassigned_cs2 = int(unassigned_out.loc[unassigned_out["CAMPUS"] == "CS2", "UNASSIGNED STUDENTS"].sum()) if not unassigned_out.empty else 0
+    unassigned_by_campus = (
+        unassigned_out.groupby("CAMPUS")["UNASSIGNED STUDENTS"].sum() if not unassigned_out.empty else pd.Series(dtype=int)
+    )
+    unassigned_cs1 = int(unassigned_by_campus.get("CS1", 0))
+    unassigned_cs2 = int(unassigned_by_campus.get("CS2", 0))
+    unassigned_total = int(unassigned_by_campus.sum())
 
     pct_allocated = (allocated_total / demand_total * 100) if demand_total else 0.0
     pct_unassigned = (unassigned_total / demand_total * 100) if demand_total else 0.0
@@ -206,16 +218,10 @@ def build_overall_summary(
         total_room_slots_used_cs2 = 0
         peak_room_slots_used = 0
 
-    if alloc_out is not None and not alloc_out.empty:
-        room_slot_sum = (
-            alloc_out.groupby(["DATE_ONLY", "TIME", "CAMPUS", "ROOM ID"], as_index=False)
-            .agg(
-                ROOM_CAPACITY=("ROOM CAPACITY", "first"),
-                TOTAL_STUDENTS=("ALLOCATED STUDENTS", "sum"),
-            )
-        )
-        total_capacity_used = int(room_slot_sum["ROOM_CAPACITY"].sum())
-        total_students_in_used = int(room_slot_sum["TOTAL_STUDENTS"].sum())
+    # room_sum already holds one row per used (DATE_ONLY, TIME, CAMPUS, ROOM ID)
+    if room_sum is not None and not room_sum.empty:
+        total_capacity_used = int(room_sum["ROOM_CAPACITY"].sum())
+        total_students_in_used = int(room_sum["TOTAL_STUDENTS"].sum())
         weighted_util = (total_students_in_used / total_capacity_used) if total_capacity_used else 0.0
     else:
         total_capacity_used = 0
@@ -263,44 +269,57 @@ def main():
     # ✅ Add 2 extra rooms (always available)
     rooms_df = add_extra_rooms_always_available(rooms_df)
 
+    # allocator room lists built once per campus and shared by every slot
     rooms_by_campus: Dict[str, List[Dict[str, Any]]] = {}
     for campus, g in rooms_df.groupby("CAMPUS_NORM"):
-        rooms_by_campus[campus] = (
-            g.sort_values("CAPACITY", ascending=False)[["ROOM ID", "CAPACITY", "EXAM CAPACITY"]]
-            .to_dict("records")
-        )
+        g = g.sort_values("CAPACITY", ascending=False)
+        rooms_by_campus[campus] = [
+            {"room_id": str(room_id), "cap": int(cap), "exam_cap": int(exam_cap)}
+            for room_id, cap, exam_cap in zip(
+                g["ROOM ID"].tolist(), g["CAPACITY"].tolist(), g["EXAM CAPACITY"].tolist()
+            )
+        ]
 
     all_allocations: List[Dict[str, Any]] = []
     all_unassigned: List[Dict[str, Any]] = []
 
-    for (date_only, time_val), slot in students_df.groupby(["DATE_ONLY", "TIME"]):
+    # slots are contiguous [start, end) ranges of one stable sort by (DATE_ONLY, TIME), in groupby order;
+    # rows with a missing DATE_ONLY/TIME are left out, as groupby drops them
+    date_codes, date_values = pd.factorize(students_df["DATE_ONLY"], sort=True)
+    time_codes, time_values = pd.factorize(students_df["TIME"], sort=True)
+    order = np.lexsort((time_codes, date_codes))
+    order = order[(date_codes[order] >= 0) & (time_codes[order] >= 0)]
+    slot_codes = date_codes[order] * len(time_values) + time_codes[order]
+    starts = np.flatnonzero(np.diff(slot_codes, prepend=-1))
+    ends = np.append(starts[1:], len(order))
+
+    course_ids_all = students_df["COURSE ID"].to_numpy()[order].tolist()
+    students_all = {campus: students_df[campus].to_numpy()[order].tolist() for campus in CAMPUSES}
+
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        date_only = date_values[date_codes[order[start]]]
+        time_val = time_values[time_codes[order[start]]]
+        course_ids = course_ids_all[start:end]
+
         for campus in CAMPUSES:
             if campus not in rooms_by_campus:
                 continue
 
-            demands: List[Dict[str, Any]] = []
-            for _, row in slot.iterrows():
-                n = int(row[campus])
-                if n <= 0:
-                    continue
-                demands.append(
-                    {
-                        "course_id": str(row["COURSE ID"]),
-                        "students": n,
-                        "date": date_only,
-                        "time": time_val,
-                        "campus": campus,
-                    }
-                )
+            demands: List[Dict[str, Any]] = [
+                {
+                    "course_id": str(cid),
+                    "students": n,
+                    "date": date_only,
+                    "time": time_val,
+                    "campus": campus,
+                }
+                for cid, n in zip(course_ids, students_all[campus][start:end])
+                if n > 0
+            ]
             if not demands:
                 continue
 
-            rooms = [
-                {"room_id": str(r["ROOM ID"]), "cap": int(r["CAPACITY"]), "exam_cap": int(r["EXAM CAPACITY"])}
-                for r in rooms_by_campus[campus]
-            ]
-
-            allocations, unassigned = split_allocate_fill_rooms(demands, rooms)
+            allocations, unassigned = split_allocate_fill_rooms(demands, rooms_by_campus[campus])
             all_allocations.extend(allocations)
             all_unassigned.extend(unassigned)
 
@@ -339,21 +358,14 @@ def main():
     unassigned_out.to_csv(OUT_UNASSIGNED, index=False, encoding="utf-8-sig")
 
     if not alloc_out.empty:
-        rooms_used_day = (
-            alloc_out[["DATE_ONLY", "TIME", "CAMPUS", "ROOM ID"]]
-            .drop_duplicates()
-            .groupby(["DATE_ONLY", "CAMPUS"], as_index=False)
-            .size()
-            .rename(columns={"size": "ROOM_SLOTS_USED"})
-        )
-
+        # one room_sum row per used room slot, so counting rows per (DATE_ONLY, CAMPUS) needs no dedup pass;
+        # the counts are unique per (DATE_ONLY, CAMPUS), so unstack reshapes them without pivot_table's aggregation;
+        # as floats, the way pivot_table's mean wrote them to the CSV
         rooms_used_pivot = (
-            rooms_used_day.pivot_table(
-                index="DATE_ONLY",
-                columns="CAMPUS",
-                values="ROOM_SLOTS_USED",
-                fill_value=0,
-            )
+            room_sum.groupby(["DATE_ONLY", "CAMPUS"])
+            .size()
+            .astype(float)
+            .unstack("CAMPUS", fill_value=0.0)
             .reset_index()
         )
 
@@ -373,6 +385,7 @@ def main():
         alloc_out=alloc_out,
         unassigned_out=unassigned_out,
         rooms_df=rooms_df,
+        room_sum=room_sum,
         rooms_used_pivot=rooms_used_pivot,
     )
     df_tongket.to_csv(OUT_TONGKET, index=False, encoding="utf-8-sig")
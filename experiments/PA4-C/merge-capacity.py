@@ -11,6 +11,7 @@
 #   ROOM CAPACITY, ROOM EXAM CAPACITY,
 #   TOTAL STUDENTS, COURSES MERGED, UTILIZATION
 
+import numpy as np
 import pandas as pd
 
 IN_FILE = "allocation_plan.csv"
@@ -18,6 +19,7 @@ OUT_FILE = "merge_suggestions.csv"
 
 
 def main():
+    # default C engine: DATE_ONLY stays text and a blank count cell reads as NaN for the coercion below
     df = pd.read_csv(IN_FILE, encoding="utf-8-sig")
 
     base_required = [
@@ -78,16 +80,19 @@ def main():
         ["DATE_ONLY", "TIME", "CAMPUS", "ROOM ID", "ALLOCATED"],
         ascending=[True, True, True, True, False],
     )
-    per_course["COURSE_ITEM"] = per_course.apply(
-        lambda r: f"{r['COURSE ID']}({int(r['ALLOCATED'])})",
-        axis=1
+    per_course["COURSE_ITEM"] = (
+        per_course["COURSE ID"].astype(str) + "(" + per_course["ALLOCATED"].astype(str) + ")"
     )
 
-    courses_join = (
-        per_course.groupby(["DATE_ONLY", "TIME", "CAMPUS", "ROOM ID"])["COURSE_ITEM"]
-                 .agg(lambda s: ", ".join(s.tolist()))
-                 .reset_index(name="COURSES MERGED")
-    )
+    # the sort above leaves each room's courses contiguous: join [start, end) slices of one item list
+    # instead of a per-group Series in groupby.agg
+    room_keys = per_course[["DATE_ONLY", "TIME", "CAMPUS", "ROOM ID"]]
+    starts = np.flatnonzero(room_keys.ne(room_keys.shift()).any(axis=1).to_numpy())
+    ends = np.append(starts[1:], len(per_course))
+    items = per_course["COURSE_ITEM"].tolist()
+
+    courses_join = room_keys.iloc[starts].reset_index(drop=True)
+    courses_join["COURSES MERGED"] = [", ".join(items[s:e]) for s, e in zip(starts.tolist(), ends.tolist())]
 
     out = per_room.merge(courses_join, on=["DATE_ONLY", "TIME", "CAMPUS", "ROOM ID"], how="left")
 
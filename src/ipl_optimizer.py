@@ -105,19 +105,18 @@ class GreedyBinPacker:
         """
         validate_room_data(self.rooms, self.students, self.capacities)
         
-        # Initialize: each room assigned to itself
-        assignment = list(range(self.num_rooms))
-        current_load = list(self.students)
-        current_subjects = [set([subj]) for subj in self.subjects]
-        
         # MULTI-PASS ALGORITHM: Try multiple strategies, pick the best
         # This strategy aims to maximize space utilization by evaluating multiple sorting criteria.
         
+        # Subjects as integer bitmasks: disjointness is a single AND, merging a single OR
+        subject_codes = {}
+        subject_bits = [1 << subject_codes.setdefault(subj, len(subject_codes)) for subj in self.subjects]
+        
         def try_best_fit(order):
             """Try Best-Fit with given order"""
             assign = list(range(self.num_rooms))
             load = list(self.students)
-            subj = [set([s]) for s in self.subjects]
+            subj = list(subject_bits)
             
             for src in order:
                 if assign[src] != src:
@@ -129,7 +128,7 @@ class GreedyBinPacker:
                     total = load[tgt] + load[src]
                     if total > self.capacities[tgt]:
                         continue
-                    if not subj[src].isdisjoint(subj[tgt]):
+                    if subj[src] & subj[tgt]:
                         continue
                     w = self.capacities[tgt] - total
                     if w < min_w:
@@ -137,7 +136,7 @@ class GreedyBinPacker:
                 if best is not None:
                     assign[src] = best
                     load[best] += load[src]
-                    subj[best].update(subj[src])
+                    subj[best] |= subj[src]
             
             return assign, load, subj
         
@@ -145,7 +144,7 @@ class GreedyBinPacker:
             """Try First-Fit with given order"""
             assign = list(range(self.num_rooms))
             load = list(self.students)
-            subj = [set([s]) for s in self.subjects]
+            subj = list(subject_bits)
             
             for src in order:
                 if assign[src] != src:
@@ -156,11 +155,11 @@ class GreedyBinPacker:
                     total = load[tgt] + load[src]
                     if total > self.capacities[tgt]:
                         continue
-                    if not subj[src].isdisjoint(subj[tgt]):
+                    if subj[src] & subj[tgt]:
                         continue
                     assign[src] = tgt
                     load[tgt] += load[src]
-                    subj[tgt].update(subj[src])
+                    subj[tgt] |= subj[src]
                     break
             
             return assign, load, subj
@@ -169,7 +168,7 @@ class GreedyBinPacker:
             """Try Worst-Fit with given order"""
             assign = list(range(self.num_rooms))
             load = list(self.students)
-            subj = [set([s]) for s in self.subjects]
+            subj = list(subject_bits)
             
             for src in order:
                 if assign[src] != src:
@@ -181,7 +180,7 @@ class GreedyBinPacker:
                     total = load[tgt] + load[src]
                     if total > self.capacities[tgt]:
                         continue
-                    if not subj[src].isdisjoint(subj[tgt]):
+                    if subj[src] & subj[tgt]:
                         continue
                     space = self.capacities[tgt] - total
                     if space > max_space:
@@ -189,7 +188,7 @@ class GreedyBinPacker:
                 if best is not None:
                     assign[src] = best
                     load[best] += load[src]
-                    subj[best].update(subj[src])
+                    subj[best] |= subj[src]
             
             return assign, load, subj
         
@@ -211,7 +210,7 @@ class GreedyBinPacker:
         
         # Find best result
         best_result = min(results, key=lambda x: count_open(x[0]))
-        assignment, current_load, current_subjects = best_result
+        assignment = best_result[0]
         
         open_rooms = [idx for idx in range(self.num_rooms) if assignment[idx] == idx]
         merge_count = self.num_rooms - len(open_rooms)